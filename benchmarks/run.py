@@ -0,0 +1,215 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from benchmarks.stub_server import StubServer
+
+SUITES = ["throughput", "memory", "curl"]
+QUICK = {"rows": 2000, "sizes": [1000, 10000], "curl_seconds": 0.5}
+CURL_CASES = {
+    "small": {"headers": 5, "body_items": 10},
+    "large": {"headers": 100, "body_items": 2000},
+    "form": {"headers": 20, "form_fields": 200},
+}
+# Metrics where a smaller number is the better one, for compare.
+LOWER_IS_BETTER = {"errors", "wall_s", "cpu_s", "cpu_us_per_row", "wall_us_per_row", "peak_rss_mb", "rss_growth_mb", "us_per_command"}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Benchmark the Loopify batch engine and cURL parser.")
+    commands = parser.add_subparsers(dest="command")
+    run = commands.add_parser("run", help="Run the benchmarks (the default).")
+    run.add_argument("--suite", action="append", choices=SUITES, help="Only run this suite; may be repeated.")
+    run.add_argument("--quick", action="store_true", help="Small inputs for a fast smoke run.")
+    run.add_argument("--rows", type=int, default=20000, help="Rows per throughput run (default: 20000).")
+    run.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels for the throughput suite.")
+    run.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated input sizes for the memory suite.")
+    run.add_argument("--bodies", default="full", help="Response body capture mode for batch runs (default: full).")
+    run.add_argument("--latency-ms", type=float, default=0.0, help="Stub server delay per request.")
+    run.add_argument("--payload-bytes", type=int, default=256, help="Stub server response size.")
+    run.add_argument("--error-rate", type=float, default=0.0, help="Share of stub responses that are 500s.")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--curl-seconds", type=float, default=2.0, help="Time spent on each cURL case.")
+    run.add_argument("-o", "--output", help="Write the JSON results here instead of stdout.")
+    compare = commands.add_parser("compare", help="Compare two result files.")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    return parser
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def write_batch_file(path, rows, base_url):
+    # Alternating GETs and small JSON POSTs, like a typical batch file.
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["method", "url", "headers", "payload_type", "payload"])
+        for i in range(rows):
+            if i % 2:
+                writer.writerow(["POST", f"{base_url}/items", '{"Accept": "application/json"}', "json", f'{{"id": {i}, "name": "item {i}"}}'])
+            else:
+                writer.writerow(["GET", f"{base_url}/items/{i}", '{"Accept": "application/json"}', "none", ""])
+
+def batch_case(path, concurrency, bodies, output_dir):
+    # Runs in a fresh process, so its CPU time and peak memory belong to the
+    # engine alone; the stub server stays in the parent.
+    from loopify.capture import BodyCapture
+    from loopify.utilities import run_batch_requests
+    baseline_rss = peak_rss_mb()
+    output_path = os.path.join(output_dir, f"results-{os.getpid()}.csv")
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    summary = run_batch_requests(path, "csv", concurrency=concurrency, output_path=output_path,
+                                 capture=BodyCapture(bodies))
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    rows = summary["rows"] if summary else 0
+    peak = peak_rss_mb()
+    return {
+        "rows": rows, "errors": summary["errors"] if summary else None,
+        "wall_s": wall, "requests_per_s": rows / wall if wall else None,
+        "cpu_s": cpu, "cpu_us_per_row": cpu / rows * 1e6 if rows else None,
+        "wall_us_per_row": wall / rows * 1e6 if rows else None,
+        "peak_rss_mb": peak, "rss_growth_mb": peak - baseline_rss if peak is not None else None,
+    }
+
+def run_isolated(func, *args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+def curl_command(headers=5, body_items=0, form_fields=0):
+    lines = ["curl -X POST 'https://api.example.com/v1/items?page=1&size=100' \\"]
+    lines += [f"  -H 'X-Custom-Header-{i}: value-{i}-{'v' * 20}' \\" for i in range(headers)]
+    if form_fields:
+        lines += [f"  -d 'field{i}=value{i}' \\" for i in range(form_fields)]
+        lines.append("  --compressed")
+    else:
+        body = json.dumps({"items": [{"id": i, "name": f"item {i}", "tags": ["a", "b"]} for i in range(body_items)]})
+        lines.append("  -H 'Content-Type: application/json' \\")
+        lines.append(f"  --data-raw '{body}'")
+    return "\n".join(lines)
+
+def curl_case(name, seconds, **shape):
+    from loopify.utilities import parse_curl_command
+    command = curl_command(**shape)
+    parse_curl_command(command)
+    count = 0
+    started = time.perf_counter()
+    while True:
+        parse_curl_command(command)
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            break
+    return {
+        "name": f"curl/{name}", "suite": "curl", "command_bytes": len(command), "commands": count,
+        "commands_per_s": count / elapsed, "us_per_command": elapsed / count * 1e6,
+        "mb_per_s": len(command) * count / elapsed / 1e6,
+    }
+
+def report(message):
+    print(message, file=sys.stderr, flush=True)
+
+def run_benchmarks(args):
+    suites = args.suite or SUITES
+    rows = QUICK["rows"] if args.quick else args.rows
+    sizes = QUICK["sizes"] if args.quick else [int(size) for size in args.sizes.split(",") if size]
+    curl_seconds = QUICK["curl_seconds"] if args.quick else args.curl_seconds
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    stub = {"latency_ms": args.latency_ms, "payload_bytes": args.payload_bytes, "error_rate": args.error_rate, "seed": args.seed}
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="loopify-bench-")
+    try:
+        with StubServer(**stub) as server:
+            if "throughput" in suites:
+                path = os.path.join(work_dir, f"batch-{rows}.csv")
+                write_batch_file(path, rows, server.url)
+                for level in levels:
+                    report(f"throughput: {rows} rows at concurrency {level}")
+                    result = run_isolated(batch_case, path, level, args.bodies, work_dir)
+                    results.append({"name": f"throughput/c{level}", "suite": "throughput", "concurrency": level, **result})
+            if "memory" in suites:
+                for size in sizes:
+                    path = os.path.join(work_dir, f"batch-{size}.csv")
+                    write_batch_file(path, size, server.url)
+                    report(f"memory: {size} rows at concurrency {max(levels)}")
+                    result = run_isolated(batch_case, path, max(levels), args.bodies, work_dir)
+                    results.append({"name": f"memory/{size}", "suite": "memory", "concurrency": max(levels),
+                                    "input_mb": os.path.getsize(path) / 1e6, **result})
+                    os.remove(path)
+        if "curl" in suites:
+            for name, shape in CURL_CASES.items():
+                report(f"curl: {name}")
+                results.append(curl_case(name, curl_seconds, **shape))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "benchmark": "loopify", "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "quick": args.quick, "bodies": args.bodies, "stub": stub, "results": results,
+    }
+
+def compare(base, new):
+    base_results = {result["name"]: result for result in base["results"]}
+    lines = [f"{base.get('commit') or 'base'} -> {new.get('commit') or 'new'}"]
+    for result in new["results"]:
+        old = base_results.get(result["name"])
+        if old is None:
+            continue
+        lines.append(result["name"])
+        for metric, value in result.items():
+            before = old.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or metric in ("rows", "commands", "concurrency"):
+                continue
+            change = (value - before) / before * 100 if before else 0.0
+            better = change < 0 if metric in LOWER_IS_BETTER else change > 0
+            mark = "" if abs(change) < 1 else (" better" if better else " worse")
+            lines.append(f"  {metric:<16} {before:>12.3f} -> {value:>12.3f}  {change:+6.1f}%{mark}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in ("run", "compare", "-h", "--help"):
+        argv = ["run", *argv]
+    args = build_parser().parse_args(argv)
+    if args.command == "compare":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        print(compare(base, new))
+        return 0
+    results = run_benchmarks(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        report(f"Results written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle and
+    # delayed ACKs add ~40 ms to every keep-alive request.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        status = 500 if server.fail() else 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+class StubServer(ThreadingHTTPServer):
+    # A keep-alive JSON endpoint with a fixed delay, response size and share
+    # of 500s. The error pattern comes from a seeded generator so two runs
+    # see the same sequence.
+    daemon_threads = True
+
+    def __init__(self, latency_ms=0.0, payload_bytes=256, error_rate=0.0, seed=0, port=0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        filler = max(0, payload_bytes - len(json.dumps({"ok": True, "data": ""})))
+        self.body = json.dumps({"ok": True, "data": "x" * filler}).encode()
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def fail(self):
+        if not self.error_rate:
+            return False
+        with self.random_lock:
+            return self.random.random() < self.error_rate
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="stub-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
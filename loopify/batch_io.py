@@ -0,0 +1,494 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from loopify.templates import iter_template_chunks
+
+REQUIRED_COLUMNS = ['method', 'url', 'payload_type']
+OPTIONAL_COLUMNS = ['headers', 'payload']
+CHUNK_ROWS = 1000
+READ_SIZE = 64 * 1024
+
+def detect_file_type(file_name):
+    if file_name.lower().endswith('.template.json'):
+        return 'template'
+    if file_name.lower().endswith('.workflow.json'):
+        return 'workflow'
+    ext = os.path.splitext(file_name)[1].lower().lstrip('.')
+    if ext in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if ext == 'json':
+        return 'json'
+    return 'csv'
+
+def open_binary(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), True
+    return source, False
+
+def stream_size(stream):
+    try:
+        pos = stream.tell()
+        stream.seek(0, io.SEEK_END)
+        size = stream.tell()
+        stream.seek(pos)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def _peek_first_char(text):
+    while True:
+        chunk = text.read(1)
+        if not chunk or not chunk.isspace():
+            return chunk
+
+JSON_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+NUMBER_CHARS = set("0123456789+-.eE")
+
+def _may_be_cut_off(buf, error):
+    # raw_decode only sees the current buffer, so an error can mean the
+    # record simply continues in the next read. Anything else is a real
+    # syntax error and is raised without reading the rest of the file.
+    if error.msg.startswith("Unterminated string"):
+        return True
+    if "escape" in error.msg:
+        return len(buf) - error.pos < 6
+    rest = buf[error.pos:].strip()
+    return (not rest or set(rest) <= NUMBER_CHARS
+            or any(literal.startswith(rest) for literal in JSON_LITERALS))
+
+def iter_json_array_records(text):
+    # Decodes one array element at a time with raw_decode, so only the
+    # current record and one read buffer are ever held in memory.
+    decoder = json.JSONDecoder()
+    buf, pos = "", 0
+    expected = "{]"
+
+    def next_char():
+        nonlocal buf, pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            buf, pos = text.read(READ_SIZE), 0
+            if not buf:
+                raise ValueError("Unexpected end of file: JSON array is not closed.")
+
+    while True:
+        char = next_char()
+        if char not in expected:
+            if expected == ",]":
+                raise ValueError(f"Expected ',' or ']' after an array item, found '{char}'.")
+            raise ValueError("Each item of the JSON array must be an object.")
+        if char == ']':
+            return
+        if char == ',':
+            pos += 1
+            expected = "{"
+            continue
+        while True:
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError as e:
+                if not _may_be_cut_off(buf, e):
+                    raise
+                # Reads grow with the record, so a big record is copied a
+                # logarithmic number of times rather than once per 64 KB.
+                more = text.read(max(READ_SIZE, len(buf) - pos))
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+        yield record
+        pos = end
+        expected = ",]"
+
+def iter_json_lines_records(text):
+    for line_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_no}: invalid JSON ({e})")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_no}: each line must be a JSON object.")
+        yield record
+
+def _records_to_chunks(records, chunk_rows):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            yield pd.DataFrame.from_records(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame.from_records(chunk)
+
+def _as_cell_text(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    return str(value)
+
+def normalize_chunk(chunk, start_index, decoded_json=False, extra_columns=()):
+    columns = REQUIRED_COLUMNS + OPTIONAL_COLUMNS + list(extra_columns)
+    for col in columns:
+        if col not in chunk.columns:
+            chunk[col] = ''
+    chunk = chunk[columns]
+    if decoded_json:
+        # JSON records may hold real objects or nulls where CSV cells
+        # always hold text; bring them to the same shape.
+        chunk = chunk.map(_as_cell_text)
+    chunk.index = pd.RangeIndex(start_index, start_index + len(chunk))
+    return chunk
+
+def iter_batch_chunks(source, file_type, chunk_rows=CHUNK_ROWS, extra_columns=()):
+    stream, owned = open_binary(source)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if file_type == 'csv':
+            chunks = pd.read_csv(text, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        elif file_type == 'template':
+            # A template file is one request plus a data source; a relative
+            # data path is looked up next to the template.
+            base_dir = os.path.dirname(os.path.abspath(source)) if isinstance(source, (str, os.PathLike)) else None
+            chunks = iter_template_chunks(json.load(text), chunk_rows, base_dir)
+        else:
+            first = _peek_first_char(text)
+            if first == '[':
+                records = iter_json_array_records(text)
+            elif first == '{':
+                text.seek(0)
+                records = iter_json_lines_records(text)
+            elif not first:
+                return
+            else:
+                raise ValueError("JSON batch files must be an array of objects or JSON Lines.")
+            chunks = _records_to_chunks(records, chunk_rows)
+        start_index = 0
+        for chunk in chunks:
+            if start_index == 0:
+                missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+                if missing:
+                    raise ValueError(
+                        f"File must contain at least these columns: {', '.join(REQUIRED_COLUMNS)}. "
+                        "Optional columns: 'headers' (JSON string), 'payload' (JSON string or text)"
+                    )
+            yield normalize_chunk(chunk, start_index, decoded_json=file_type in ('json', 'jsonl'), extra_columns=extra_columns)
+            start_index += len(chunk)
+    finally:
+        if owned:
+            text.close()
+        else:
+            text.detach()
+
+RESULT_COLUMNS = [
+    "Request #", "Method", "URL", "Status Code", "Response Body", "Error",
+    "Attempts", "Elapsed (s)", "Latency (ms)", "TTFB (ms)",
+    "Request Size (B)", "Response Size (B)", "Started At", "Error Type", "Body Truncated", "Cache", "Workflow #", "Step",
+]
+RESULT_FORMATS = {"csv": "csv", "jsonl": "jsonl", "parquet": "parquet"}
+RUNS_DIR = os.path.join(".loopify", "runs")
+DATA_DIR = os.path.join(".loopify", "data")
+PARQUET_ROW_GROUP = 1000
+
+def _as_text(value):
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+class CsvResultSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(RESULT_COLUMNS)
+
+    def write(self, result_row):
+        self.writer.writerow([
+            _as_text(value) if col == "Response Body" else value
+            for col, value in ((col, result_row.get(col, "")) for col in RESULT_COLUMNS)
+        ])
+
+    def flush(self):
+        self.file.flush()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+class JsonlResultSink:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, result_row):
+        self.file.write(json.dumps({col: result_row.get(col, "") for col in RESULT_COLUMNS}, default=str))
+        self.file.write("\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+class ParquetResultSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing Parquet results needs pyarrow. Install it or pick CSV/JSON Lines.")
+        self.path = path
+        self.pa = pa
+        # Status codes mix ints and "ERROR", and bodies mix JSON and text,
+        # so every column is stored as text.
+        self.schema = pa.schema([(col, pa.string()) for col in RESULT_COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.buffer = []
+
+    def write(self, result_row):
+        self.buffer.append({col: _as_text(result_row.get(col, "")) for col in RESULT_COLUMNS})
+        if len(self.buffer) >= PARQUET_ROW_GROUP:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.write_table(self.pa.Table.from_pylist(self.buffer, schema=self.schema))
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+def create_result_sink(path, output_format):
+    if output_format == "jsonl":
+        return JsonlResultSink(path)
+    if output_format == "parquet":
+        return ParquetResultSink(path)
+    return CsvResultSink(path)
+
+def new_run_dir(run_id=None):
+    run_id = run_id or uuid.uuid4().hex[:12]
+    path = os.path.join(RUNS_DIR, run_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def results_path(run_dir, output_format):
+    return os.path.join(run_dir, f"results.{RESULT_FORMATS.get(output_format, 'csv')}")
+
+def parse_body(value):
+    if isinstance(value, str) and value.lstrip()[:1] in ('{', '['):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return value
+
+def iter_result_chunks(path, output_format, chunk_rows=CHUNK_ROWS):
+    if output_format == "jsonl":
+        with open(path, encoding='utf-8') as f:
+            while True:
+                lines = list(itertools.islice(f, chunk_rows))
+                if not lines:
+                    return
+                yield pd.DataFrame([json.loads(line) for line in lines], columns=RESULT_COLUMNS)
+    elif output_format == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # Bodies may contain newlines, so rows are counted by the CSV
+        # parser rather than by raw lines.
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+
+def result_row_offsets(path, output_format):
+    # Where each result row starts, so one row can be read back without
+    # loading the rest: a byte offset in CSV and JSON Lines, the row number
+    # in Parquet. A CSV newline only ends a row outside quotes, and quotes
+    # inside a field come in pairs, so an even quote count marks the end.
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        return np.arange(pq.ParquetFile(path).metadata.num_rows, dtype=np.int64)
+    ends = []
+    pos = 0
+    quotes = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            data = np.frombuffer(block, dtype=np.uint8)
+            newlines = np.flatnonzero(data == ord("\n"))
+            if output_format != "jsonl":
+                counts = np.cumsum(data == ord('"')) + quotes
+                newlines = newlines[counts[newlines] % 2 == 0]
+                quotes = int(counts[-1]) % 2
+            ends.append(newlines + pos + 1)
+            pos += len(block)
+    starts = np.concatenate([[0]] + ends).astype(np.int64)
+    starts = starts[starts < pos]
+    return starts if output_format == "jsonl" else starts[1:]
+
+def read_result_value(path, output_format, offset, column):
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        for group in range(parquet.num_row_groups):
+            rows = parquet.metadata.row_group(group).num_rows
+            if offset < rows:
+                return parquet.read_row_group(group, columns=[column]).column(0)[int(offset)].as_py()
+            offset -= rows
+        raise IndexError("Result row out of range.")
+    if output_format == "jsonl":
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline()).get(column)
+    with open(path, encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f))
+        f.seek(offset)
+        return dict(zip(header, next(csv.reader(f)))).get(column)
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+CHECKPOINT_COMPACT_BYTES = 4 * 1024 * 1024
+
+def fingerprint_source(source, extra=""):
+    stream, owned = open_binary(source)
+    digest = hashlib.sha256(extra.encode('utf-8'))
+    try:
+        pos = stream.tell()
+        for block in iter(lambda: stream.read(READ_SIZE), b""):
+            digest.update(block)
+        stream.seek(pos)
+    finally:
+        if owned:
+            stream.close()
+    return digest.hexdigest()[:16]
+
+def checkpoint_path(run_dir):
+    return os.path.join(run_dir, CHECKPOINT_FILE)
+
+def load_checkpoint(path, source_id=None):
+    # The journal holds a header, "flushed" markers recording how much of
+    # the results file is complete, and the results of rows that finished
+    # ahead of that point. A torn last line from a crash is ignored.
+    state = {"source": None, "flushed": 0, "offset": 0, "errors": 0, "ready": {}, "complete": False}
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if "source" in entry:
+                state["source"] = entry["source"]
+            elif "row" in entry:
+                state["ready"][entry["row"]] = entry["result"]
+            elif "flushed" in entry:
+                state.update(flushed=entry["flushed"], offset=entry["offset"], errors=entry["errors"])
+            elif entry.get("complete"):
+                state["complete"] = True
+    if source_id is not None and state["source"] != source_id:
+        raise ValueError("The checkpoint belongs to a different input file.")
+    state["ready"] = {row: result for row, result in state["ready"].items() if row >= state["flushed"]}
+    return state
+
+def truncate_results(path, offset):
+    if os.path.exists(path):
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+
+class CheckpointJournal:
+    def __init__(self, path, source_id=None, fresh=True, recorded=()):
+        self.path = path
+        self.source_id = source_id
+        self.file = open(path, 'w' if fresh else 'a', encoding='utf-8')
+        # Rows already in the journal, so each waiting row is written once.
+        self.recorded = set(recorded)
+        if fresh:
+            self._append({"source": source_id})
+        self.compact_at = max(CHECKPOINT_COMPACT_BYTES, 2 * self.file.tell())
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry, default=str))
+        self.file.write("\n")
+
+    def record_result(self, row, result_row):
+        self._append({"row": int(row), "result": result_row})
+        self.recorded.add(row)
+
+    def record_flushed(self, flushed, offset, errors, ready):
+        # Rows that went straight to the results file are covered by the
+        # marker; only the ones still waiting on an earlier row are kept.
+        for row, result_row in ready.items():
+            if row not in self.recorded:
+                self.record_result(row, result_row)
+        self.recorded.intersection_update(ready)
+        self._append({"flushed": flushed, "offset": offset, "errors": errors})
+        self.file.flush()
+        if self.file.tell() > self.compact_at:
+            self.compact(flushed, offset, errors, ready)
+
+    def compact(self, flushed, offset, errors, ready):
+        # Rows below the flushed mark are already in the results file, so
+        # only the marker and the rows still waiting on an earlier one
+        # need to survive.
+        self.file.close()
+        tmp_path = self.path + ".tmp"
+        self.recorded = set()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            self.file = f
+            self._append({"source": self.source_id})
+            for row, result_row in ready.items():
+                self.record_result(row, result_row)
+            self._append({"flushed": flushed, "offset": offset, "errors": errors})
+            # A journal that is mostly waiting rows would otherwise be
+            # rewritten on every flush.
+            self.compact_at = max(CHECKPOINT_COMPACT_BYTES, 2 * f.tell())
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def mark_complete(self):
+        self._append({"complete": True})
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def save_upload(upload, run_dir, file_type):
+    # The upload is copied next to the results so a background run reads
+    # from disk and can still be resumed after the session is gone.
+    path = os.path.join(run_dir, f"input.{file_type}")
+    upload.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(upload, f, READ_SIZE)
+    upload.seek(0)
+    return path
+
+def save_template_data(upload):
+    # Data files for templates are stored by content, so the same upload
+    # maps to the same path and a template that uses it keeps its run id.
+    data = upload.getvalue()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(DATA_DIR, f"{hashlib.sha256(data).hexdigest()[:16]}.csv"))
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return path
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHEABLE_METHODS = {"GET", "HEAD"}
+# Statuses a cache may reuse without explicit freshness information.
+CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+# Per-request ids and tracing headers differ on every row without changing
+# the response, so they are left out of the key.
+UNKEYED_HEADERS = {"x-request-id", "x-correlation-id", "traceparent", "tracestate"}
+CACHE_OUTCOMES = {
+    "hit": "Served from the cache",
+    "coalesced": "Shared a duplicate request in flight",
+    "revalidated": "Server confirmed the cached copy (304)",
+    "miss": "Sent and stored",
+}
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300.0
+CACHE_PATH = os.path.join(".loopify", "cache.sqlite")
+
+def _max_age(cache_control):
+    match = re.search(r"max-age\s*=\s*\"?(\d+)", cache_control)
+    return int(match.group(1)) if match else None
+
+class DiskStore:
+    # Entries as JSON in one SQLite table, so a cache survives restarts and
+    # the worker processes of a sharded run can share it.
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, entry TEXT, expires REAL)")
+        # Expired entries without a validator can never be used again.
+        self.conn.execute(
+            "DELETE FROM entries WHERE expires < ? AND json_extract(entry, '$.etag') IS NULL "
+            "AND json_extract(entry, '$.last_modified') IS NULL", (time.time(),)
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        row = self.conn.execute("SELECT entry FROM entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, entry):
+        self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, json.dumps(entry), entry["expires"]))
+        self.conn.commit()
+
+    def clear(self):
+        self.conn.execute("DELETE FROM entries")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class ResponseCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, store_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = max(0.0, float(ttl))
+        self.store_path = store_path
+        self.store = DiskStore(store_path) if store_path else None
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.in_flight = {}
+
+    # Sharded runs pickle their options into each worker process; every
+    # process gets its own memory cache over the same disk store.
+    def __getstate__(self):
+        return {"max_entries": self.max_entries, "ttl": self.ttl, "store_path": self.store_path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def key(self, method, url, headers, data, capture):
+        if method not in CACHEABLE_METHODS:
+            return None
+        keyed = sorted((k.lower(), str(v)) for k, v in headers.items() if k.lower() not in UNKEYED_HEADERS)
+        parts = [method, url, json.dumps(keyed), hashlib.sha256(data or b"").hexdigest(),
+                 f"{capture.mode}:{capture.max_bytes}"]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def claim(self, key):
+        # Returns (entry, outcome). On "hit" or "coalesced" the entry is the
+        # response; on "lead" the caller sends the request, with the stale
+        # entry (if any) to revalidate, and must call release() afterwards.
+        # Duplicates that arrive meanwhile wait for the leader instead of
+        # sending the same request again.
+        waited = False
+        while True:
+            with self.lock:
+                entry = self._lookup(key)
+                if entry is not None and entry["expires"] > time.time():
+                    return entry, "coalesced" if waited else "hit"
+                pending = self.in_flight.get(key)
+                if pending is None:
+                    self.in_flight[key] = threading.Event()
+                    if entry is not None and not (entry.get("etag") or entry.get("last_modified")):
+                        entry = None
+                    return entry, "lead"
+            pending.wait()
+            waited = True
+
+    def release(self, key, entry=None):
+        with self.lock:
+            if entry is not None:
+                self._remember(key, entry)
+                if self.store is not None:
+                    self.store.put(key, entry)
+            pending = self.in_flight.pop(key, None)
+        if pending is not None:
+            pending.set()
+
+    def freshness(self, headers):
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return 0.0
+        max_age = _max_age(cache_control)
+        return self.ttl if max_age is None else min(self.ttl, max_age)
+
+    def new_entry(self, result_row, headers):
+        lifetime = self.freshness(headers)
+        if lifetime is None or result_row["Status Code"] not in CACHEABLE_STATUSES:
+            return None
+        return {
+            "status": result_row["Status Code"], "body": result_row["Response Body"],
+            "size": result_row["Response Size (B)"], "truncated": result_row.get("Body Truncated", False),
+            "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+            "expires": time.time() + lifetime,
+        }
+
+    def refreshed(self, entry, headers):
+        lifetime = self.freshness(headers)
+        return {
+            **entry, "etag": headers.get("ETag") or entry.get("etag"),
+            "expires": time.time() + (lifetime or 0.0),
+        }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.store is not None:
+                self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+def revalidation_headers(entry):
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def fill_from_cache(result_row, entry, outcome):
+    result_row["Status Code"] = entry["status"]
+    result_row["Response Body"] = entry["body"]
+    result_row["Response Size (B)"] = entry["size"]
+    result_row["Body Truncated"] = entry["truncated"]
+    result_row["Cache"] = outcome
+    return result_row
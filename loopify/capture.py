@@ -0,0 +1,92 @@
+import hashlib
+
+CAPTURE_MODES = {
+    "full": "Full body",
+    "truncate": "First N bytes",
+    "hash": "SHA-256 hash only",
+    "none": "Don't keep bodies",
+}
+DEFAULT_TRUNCATE_BYTES = 1024
+MAX_BODY_BYTES = 10 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+# A body cut short is read on up to this far so the connection can go back
+# to the pool; anything longer is cheaper to drop with its connection.
+MAX_DRAIN_BYTES = 1024 * 1024
+
+def wire_size(response, read):
+    # Response sizes are counted as they came over the wire, i.e. before any
+    # Content-Encoding is undone, so a body read in full and one cut short
+    # (sized from Content-Length) report the same unit.
+    size = getattr(response, "bytes_downloaded", None)
+    if size is None:
+        tell = getattr(getattr(response, "raw", None), "tell", None)
+        size = tell() if callable(tell) else None
+    return size if isinstance(size, int) else read
+
+def _expected_size(response, read):
+    length = response.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else wire_size(response, read)
+
+class BodyCapture:
+    def __init__(self, mode="full", max_bytes=None):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown body capture mode '{mode}'.")
+        self.mode = mode
+        if mode == "truncate":
+            self.max_bytes = max(0, int(max_bytes if max_bytes is not None else DEFAULT_TRUNCATE_BYTES))
+        elif mode == "full":
+            self.max_bytes = MAX_BODY_BYTES if max_bytes is None else max(0, int(max_bytes))
+        else:
+            self.max_bytes = 0
+
+    def read(self, response):
+        # Reads a streamed response and returns (body, size, truncated). Only
+        # the kept prefix is ever held in memory; the body stays text and is
+        # parsed as JSON only when someone looks at it.
+        keep = self.mode in ("full", "truncate")
+        digest = hashlib.sha256() if self.mode == "hash" else None
+        kept = []
+        kept_bytes = 0
+        size = 0
+        truncated = False
+        complete = True
+        for chunk in response.iter_content(READ_CHUNK_BYTES):
+            size += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            if keep and not truncated:
+                room = self.max_bytes - kept_bytes
+                if len(chunk) > room:
+                    chunk = chunk[:room]
+                    truncated = True
+                kept.append(chunk)
+                kept_bytes += len(chunk)
+            if (truncated or self.mode == "none") and size - kept_bytes > MAX_DRAIN_BYTES:
+                complete = False
+                break
+        size = wire_size(response, size) if complete else _expected_size(response, size)
+        response.close()
+        if digest is not None:
+            return f"sha256:{digest.hexdigest()}", size, False
+        if not keep:
+            return "", size, False
+        encoding = response.encoding or "utf-8"
+        try:
+            body = b"".join(kept).decode(encoding, errors="replace")
+        except LookupError:
+            body = b"".join(kept).decode("utf-8", errors="replace")
+        return body, size, truncated
+
+def discard_body(response):
+    # Drains a body nobody will look at (e.g. before a retry) so the
+    # connection can be reused, without keeping any of it.
+    size = 0
+    complete = True
+    for chunk in response.iter_content(READ_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_DRAIN_BYTES:
+            complete = False
+            break
+    size = wire_size(response, size) if complete else _expected_size(response, size)
+    response.close()
+    return size
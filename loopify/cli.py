@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from loopify.batch_io import detect_file_type, fingerprint_source, RESULT_FORMATS
+from loopify.capture import BodyCapture, CAPTURE_MODES, DEFAULT_TRUNCATE_BYTES
+from loopify.cache import ResponseCache, DEFAULT_TTL
+from loopify.compression import REQUEST_ENCODINGS
+from loopify.metrics import MetricsExporter, DEFAULT_WRITE_INTERVAL
+from loopify.retries import (
+    RetryPolicy, parse_status_list, DEFAULT_RETRY_STATUSES, RETRY_ERROR_TYPES,
+    DEFAULT_RETRY_ERRORS, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+)
+from loopify.sharding import run_sharded_batch, MAX_PROCESSES
+from loopify.stats import FAILED_CLASSES
+from loopify.workflows import run_workflows
+
+EXIT_OK = 0
+EXIT_FAILED_REQUESTS = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+FAIL_ON = {
+    "error": ("ERROR",),
+    "5xx": FAILED_CLASSES,
+    "4xx": FAILED_CLASSES + ("4xx",),
+    "never": (),
+}
+PROGRESS_INTERVAL = 5.0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="loopify", description="Run Loopify batches without the web UI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Send every request in a CSV, JSON or JSON Lines batch file.")
+    run.add_argument("file", help="Batch file with method, url, headers, payload_type and payload columns, "
+                                     "a request template (*.template.json) or a workflow (*.workflow.json).")
+    run.add_argument("--file-type", choices=["csv", "json", "jsonl", "template", "workflow"], help="Defaults to the file extension.")
+
+    speed = run.add_argument_group("speed")
+    speed.add_argument("-c", "--concurrency", type=int, default=1, help="Requests in flight at once (default: 1).")
+    speed.add_argument("-p", "--processes", type=int, default=1,
+                       help=f"Split the batch across this many processes (up to {MAX_PROCESSES}); "
+                            "concurrency and rate limits are shared out between them.")
+    speed.add_argument("--rps", type=float, default=0, help="Target requests per second; 0 = unlimited.")
+    speed.add_argument("--delay", type=float, default=0, help="Seconds between requests, instead of --rps.")
+    speed.add_argument("--burst", type=int, default=1, help="Requests that may start back to back (default: 1).")
+    speed.add_argument("--per-host-rps", type=float, default=0, help="Requests per second per host; 0 = no limit.")
+    speed.add_argument("--no-adaptive", dest="adaptive", action="store_false",
+                       help="Don't back off on 429/503 and Retry-After.")
+
+    transport = run.add_argument_group("transport")
+    transport.add_argument("--http2", action="store_true",
+                           help="Use HTTP/2 (needs httpx[http2]): concurrent rows share connections as streams.")
+    transport.add_argument("--compress", choices=list(REQUEST_ENCODINGS), default="none",
+                           help="Compress request bodies of 256 bytes or more with this Content-Encoding.")
+    transport.add_argument("--no-response-compression", dest="compress_responses", action="store_false",
+                           help="Ask for uncompressed responses (Accept-Encoding: identity).")
+
+    retries = run.add_argument_group("retries and timeouts")
+    retries.add_argument("--max-attempts", type=int, default=1, help="Attempts per row; 1 = no retries.")
+    retries.add_argument("--backoff-base", type=float, default=0.5, help="First backoff in seconds (default: 0.5).")
+    retries.add_argument("--backoff-max", type=float, default=30.0, help="Longest backoff in seconds (default: 30).")
+    retries.add_argument("--retry-statuses", default=",".join(str(code) for code in DEFAULT_RETRY_STATUSES),
+                         help="Comma-separated status codes to retry.")
+    retries.add_argument("--retry-errors", default=",".join(DEFAULT_RETRY_ERRORS),
+                         help=f"Comma-separated errors to retry: {', '.join(RETRY_ERROR_TYPES)}.")
+    retries.add_argument("--retry-non-idempotent", action="store_true",
+                         help="Also retry POST and PATCH after a timeout or server error.")
+    retries.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT)
+    retries.add_argument("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT)
+
+    caching = run.add_argument_group("response cache")
+    caching.add_argument("--cache", action="store_true",
+                         help="Send identical GET/HEAD rows once and reuse the response for the rest.")
+    caching.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                         help=f"Seconds a response is reused before it is revalidated (default: {DEFAULT_TTL:g}).")
+    caching.add_argument("--cache-file", help="SQLite file that keeps the cache between runs; implies --cache.")
+
+    output = run.add_argument_group("output")
+    output.add_argument("-o", "--output", help="Results file; the format follows its extension. "
+                                               "Defaults to a new folder under .loopify/runs.")
+    output.add_argument("--output-format", choices=list(RESULT_FORMATS), help="Results format (default: csv).")
+    output.add_argument("--bodies", choices=list(CAPTURE_MODES), default="full", help="What to keep of each response body.")
+    output.add_argument("--body-bytes", type=int, default=DEFAULT_TRUNCATE_BYTES, help="Bytes to keep with --bodies truncate.")
+    output.add_argument("--checkpoint", help="Journal file that lets an interrupted run be resumed (CSV/JSON Lines only).")
+    output.add_argument("--resume", action="store_true", help="Continue the run recorded in --checkpoint.")
+    output.add_argument("--send-invalid", action="store_true",
+                        help="Send rows with problems anyway instead of stopping before the first request.")
+    output.add_argument("--summary-json", help="Also write the summary and performance report to this file.")
+    output.add_argument("--metrics-file",
+                        help="Keep Prometheus text metrics in this file while the batch runs (JSON if it ends in .json).")
+    output.add_argument("--metrics-interval", type=float, default=DEFAULT_WRITE_INTERVAL,
+                        help="Seconds between metrics file updates (default: 1).")
+    output.add_argument("--fail-on", choices=list(FAIL_ON), default="5xx",
+                        help="Exit with 1 if any request ends like this (default: 5xx, which includes errors).")
+    output.add_argument("-q", "--quiet", action="store_true", help="Only print problems and the summary.")
+    return parser
+
+def output_format_for(args):
+    if args.output_format:
+        return args.output_format
+    if args.output:
+        ext = os.path.splitext(args.output)[1].lower().lstrip('.')
+        if ext in RESULT_FORMATS:
+            return ext
+    return "csv"
+
+class ConsoleReporter:
+    def __init__(self, quiet=False, stream=sys.stderr):
+        self.quiet = quiet
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self.last_line = 0.0
+        self.line_open = False
+
+    def on_progress(self, completed, submitted, fraction, text, live=None):
+        if self.quiet:
+            return
+        if self.interactive:
+            self.stream.write(f"\r\033[K{text}")
+            self.stream.flush()
+            self.line_open = True
+        elif time.monotonic() - self.last_line >= PROGRESS_INTERVAL:
+            self.last_line = time.monotonic()
+            print(text, file=self.stream, flush=True)
+
+    def on_message(self, level, text):
+        if self.quiet and level in ("info", "success"):
+            return
+        self.end_line()
+        print(f"{level}: {text}", file=self.stream, flush=True)
+
+    def end_line(self):
+        if self.line_open:
+            self.stream.write("\n")
+            self.line_open = False
+
+def format_summary(summary):
+    report = summary["report"]
+    lines = [f"{summary['rows']} requests, {summary['errors']} errors. Results: {summary['output_path']}"]
+    if summary.get("resumed"):
+        lines.append(f"{summary['resumed']} rows came from the interrupted run.")
+    if report["rows"]:
+        classes = ", ".join(f"{klass}: {count}" for klass, count in report["status_classes"].items())
+        lines.append(f"Status: {classes}")
+        if report["throughput_rps"]:
+            lines.append(f"Throughput: {report['throughput_rps']:.1f} requests/s over {report['duration_s']:.1f} s")
+        latency = report["latency_ms"]
+        if latency:
+            hits = f" ({report['cache_hits']} cache hits not included)" if report.get("cache_hits") else ""
+            lines.append(f"Latency: p50 {latency['p50']:.1f} ms, p90 {latency['p90']:.1f} ms, "
+                         f"p99 {latency['p99']:.1f} ms, max {latency['max']:.1f} ms{hits}")
+        elif report.get("cache_hits"):
+            lines.append(f"Latency: n/a, all {report['cache_hits']} responses came from the cache")
+        for error_type, count in report["error_types"].items():
+            lines.append(f"  {error_type}: {count}")
+        if report.get("cache"):
+            lines.append("Cache: " + ", ".join(f"{outcome} {count}" for outcome, count in report["cache"].items()))
+    workflows = summary.get("workflows")
+    if workflows:
+        lines.append(f"Workflows: {workflows['instances']} run with {workflows['steps']} steps each; "
+                     f"{workflows['completed']} completed, {workflows['failed']} failed, {workflows['cancelled']} cancelled")
+    for shard in summary.get("shards", []):
+        rate = f"{shard['throughput_rps']:.1f} requests/s" if shard["throughput_rps"] else "n/a"
+        p50 = f"p50 {shard['p50_ms']:.1f} ms" if shard["p50_ms"] is not None else "p50 n/a"
+        lines.append(f"Process {shard['shard']}: {shard['status']}, {shard['rows']} rows, {rate}, {p50}")
+    return "\n".join(lines)
+
+def failed_requests(report, fail_on):
+    return sum(report["status_classes"].get(klass, 0) for klass in FAIL_ON[fail_on])
+
+def run_command(args):
+    output_format = output_format_for(args)
+    file_type = args.file_type or detect_file_type(args.file)
+    try:
+        retry_policy = RetryPolicy(
+            args.max_attempts, args.backoff_base, args.backoff_max,
+            retry_statuses=parse_status_list(args.retry_statuses),
+            retry_errors=[kind for kind in args.retry_errors.replace(" ", "").split(",") if kind],
+            retry_non_idempotent=args.retry_non_idempotent,
+        )
+        capture = BodyCapture(args.bodies, args.body_bytes if args.bodies == "truncate" else None)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    unknown = set(retry_policy.retry_errors) - set(RETRY_ERROR_TYPES)
+    if unknown:
+        print(f"error: unknown --retry-errors: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.checkpoint and args.processes > 1:
+        print("error: --checkpoint can't be used with --processes", file=sys.stderr)
+        return EXIT_USAGE
+    if args.metrics_file and args.processes > 1:
+        print("error: --metrics-file can't be used with --processes", file=sys.stderr)
+        return EXIT_USAGE
+    if args.resume and not args.checkpoint:
+        print("error: --resume needs --checkpoint", file=sys.stderr)
+        return EXIT_USAGE
+    if file_type == "workflow":
+        # Steps of one workflow share extracted values, so they can't be
+        # split across processes, cached or resumed row by row.
+        unsupported = [flag for flag, used in (
+            ("--processes", args.processes > 1), ("--checkpoint", args.checkpoint),
+            ("--cache", args.cache or args.cache_file), ("--send-invalid", args.send_invalid),
+        ) if used]
+        if unsupported:
+            print(f"error: workflows can't be run with {', '.join(unsupported)}", file=sys.stderr)
+            return EXIT_USAGE
+    if not os.path.exists(args.file):
+        print(f"error: {args.file} does not exist", file=sys.stderr)
+        return EXIT_USAGE
+
+    reporter = ConsoleReporter(args.quiet)
+    cancel_event = threading.Event()
+    outcome = {}
+    options = {
+        "processes": args.processes, "delay": args.delay, "concurrency": args.concurrency,
+        "rps": args.rps, "burst": args.burst, "per_host_rps": args.per_host_rps, "adaptive": args.adaptive,
+        "output_path": args.output, "output_format": output_format,
+        "send_invalid": args.send_invalid, "retry_policy": retry_policy,
+        "connect_timeout": args.connect_timeout, "read_timeout": args.read_timeout, "capture": capture,
+        "http2": args.http2, "compression": args.compress, "compress_responses": args.compress_responses,
+    }
+    if args.cache or args.cache_file:
+        options["cache"] = ResponseCache(ttl=args.cache_ttl, store_path=args.cache_file)
+    if args.metrics_file:
+        options["hooks"] = [MetricsExporter(args.metrics_file, interval=args.metrics_interval,
+                                            labels={"batch": os.path.basename(args.file)})]
+    if args.checkpoint:
+        options.update(checkpoint_path=args.checkpoint, resume=args.resume,
+                       source_id=fingerprint_source(args.file, extra=output_format))
+
+    def target():
+        try:
+            if file_type == "workflow":
+                del options["processes"], options["send_invalid"]
+                outcome["summary"] = run_workflows(
+                    args.file, on_progress=reporter.on_progress, on_message=reporter.on_message,
+                    cancel_event=cancel_event, **options,
+                )
+                return
+            outcome["summary"] = run_sharded_batch(
+                args.file, file_type, on_progress=reporter.on_progress, on_message=reporter.on_message,
+                cancel_event=cancel_event, **options,
+            )
+        except Exception as e:
+            reporter.on_message("error", f"Batch failed: {e}")
+
+    # The batch runs on a worker thread so Ctrl+C only asks it to stop; it
+    # then writes out what finished and leaves the checkpoint resumable.
+    worker = threading.Thread(target=target, name="loopify-cli", daemon=True)
+    worker.start()
+    interrupted = False
+    while worker.is_alive():
+        try:
+            worker.join(0.2)
+        except KeyboardInterrupt:
+            if interrupted:
+                reporter.end_line()
+                return EXIT_INTERRUPTED
+            interrupted = True
+            cancel_event.set()
+            reporter.on_message("warning", "Stopping after the requests in flight; press Ctrl+C again to quit now.")
+    reporter.end_line()
+
+    summary = outcome.get("summary")
+    if summary is None:
+        return EXIT_USAGE
+    print(format_summary(summary))
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    if summary["cancelled"]:
+        return EXIT_INTERRUPTED
+    if failed_requests(summary["report"], args.fail_on):
+        return EXIT_FAILED_REQUESTS
+    return EXIT_OK
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "run":
+        return run_command(args)
+    return EXIT_USAGE
+
+if __name__ == "__main__":
+    sys.exit(main())
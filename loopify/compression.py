@@ -0,0 +1,57 @@
+import gzip
+
+REQUEST_ENCODINGS = {
+    "none": "Uncompressed",
+    "gzip": "gzip",
+    "br": "Brotli (needs the brotli package)",
+}
+# Below this the Content-Encoding header costs about as much as the
+# compression saves, so small bodies are sent as they are.
+MIN_COMPRESS_BYTES = 256
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        try:
+            import brotlicffi as brotli
+        except ImportError:
+            raise ImportError("Brotli compression needs the brotli package. Install it or pick gzip.")
+    return brotli
+
+def check_encoding(encoding):
+    if encoding not in REQUEST_ENCODINGS:
+        raise ValueError(f"Unknown request compression '{encoding}'.")
+    if encoding == "br":
+        _brotli()
+
+def compress_body(data, encoding):
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical bodies, so
+        # compressed rows still share response cache entries.
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return _brotli().compress(data, quality=BROTLI_QUALITY)
+    return data
+
+def _has_header(headers, name):
+    return any(k.lower() == name for k in headers)
+
+def encode_request(headers, data, encoding="none", compress_responses=True):
+    # Returns the headers and body to send. Rows that already set
+    # Content-Encoding or Accept-Encoding are left as they are.
+    if data and encoding != "none" and len(data) >= MIN_COMPRESS_BYTES and not _has_header(headers, 'content-encoding'):
+        data = compress_body(data, encoding)
+        headers = {**headers, 'Content-Encoding': encoding}
+    if not compress_responses and not _has_header(headers, 'accept-encoding'):
+        headers = {**headers, 'Accept-Encoding': 'identity'}
+    return headers, data
+
+def encode_spec(spec, encoding="none", compress_responses=True):
+    i, method, url, headers, kwargs = spec
+    headers, data = encode_request(headers, kwargs.get('data'), encoding, compress_responses)
+    if data is not None:
+        kwargs = {**kwargs, 'data': data}
+    return i, method, url, headers, kwargs
@@ -0,0 +1,70 @@
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from loopify.hooks import retry_event
+
+class Dispatcher:
+    # Runs sends on a thread pool and parks retries in a heap until their
+    # backoff is over, so a row waiting to retry never holds a worker.
+    # send(spec, context, attempt) returns (result_row, retry_in, ...);
+    # context is whatever the caller needs back with the result.
+    def __init__(self, send, concurrency, hooks=None):
+        self.send = send
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.hooks = hooks
+        self.pending = {}
+        self.retry_queue = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.executor.shutdown(wait=True)
+
+    def __len__(self):
+        return len(self.pending) + len(self.retry_queue)
+
+    def submit(self, spec, context=None, attempt=1, first_started=None, last_result=None):
+        future = self.executor.submit(self.send, spec, context, attempt)
+        # A retry carries the previous attempt's result in case it never runs.
+        self.pending[future] = (spec, context, attempt, first_started or time.monotonic(), last_result)
+
+    def drop_queued(self):
+        # Sends still queued behind the workers and retries still backing
+        # off never go out. Each comes back as (spec, context, attempt,
+        # first_started, result) for the last attempt that did run, with a
+        # result of None when the first attempt never ran.
+        dropped = []
+        for future in [future for future in self.pending if future.cancel()]:
+            spec, context, attempt, first_started, last_result = self.pending.pop(future)
+            dropped.append((spec, context, attempt - 1, first_started, last_result))
+        while self.retry_queue:
+            _, _, spec, context, attempt, first_started, last_result = heapq.heappop(self.retry_queue)
+            dropped.append((spec, context, attempt - 1, first_started, last_result))
+        return dropped
+
+    def wait(self, retry=True):
+        # Starts the retries that are due, then blocks until a send finishes
+        # or the next retry is due. Returns the sends that are done for good
+        # as (spec, context, attempt, first_started, result).
+        now = time.monotonic()
+        while self.retry_queue and self.retry_queue[0][0] <= now:
+            _, _, spec, context, attempt, first_started, last_result = heapq.heappop(self.retry_queue)
+            self.submit(spec, context, attempt, first_started, last_result)
+        wait_time = max(0.0, self.retry_queue[0][0] - now) if self.retry_queue else None
+        finished = []
+        if self.pending:
+            done, _ = wait(self.pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                spec, context, attempt, first_started, _ = self.pending.pop(future)
+                result = future.result()
+                result_row, retry_in = result[0], result[1]
+                if retry_in is not None and retry:
+                    heapq.heappush(self.retry_queue, (time.monotonic() + retry_in, spec[0], spec, context, attempt + 1, first_started, result_row))
+                    if self.hooks:
+                        self.hooks.emit("retry", retry_event(result_row, attempt, retry_in))
+                else:
+                    finished.append((spec, context, attempt, first_started, result))
+        elif self.retry_queue:
+            time.sleep(wait_time)
+        return finished
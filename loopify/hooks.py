@@ -0,0 +1,82 @@
+import threading
+from loopify.stats import is_failure
+
+HOOK_EVENTS = ("before_send", "after_response", "retry", "row_error", "batch_finished")
+
+class BatchHook:
+    # Override the events you need; each gets one dict describing it.
+    # before_send and after_response run on the worker threads, so several
+    # may run at once. before_send may change event["headers"], e.g. to add
+    # a trace id. The other events run on the thread driving the batch.
+    def before_send(self, event):
+        pass
+
+    def after_response(self, event):
+        pass
+
+    def retry(self, event):
+        pass
+
+    def row_error(self, event):
+        pass
+
+    def batch_finished(self, summary):
+        pass
+
+class FunctionHooks(BatchHook):
+    # Plain callables as hooks: FunctionHooks(after_response=print).
+    def __init__(self, **callbacks):
+        unknown = set(callbacks) - set(HOOK_EVENTS)
+        if unknown:
+            raise ValueError(f"Unknown hook events: {', '.join(sorted(unknown))}.")
+        for name, callback in callbacks.items():
+            setattr(self, name, callback)
+
+class HookSet:
+    # A failing hook is reported once and then skipped over, so a bug in a
+    # metrics or tracing hook never fails the rows it watches.
+    def __init__(self, hooks, on_message=None):
+        self.hooks = list(hooks or [])
+        self.on_message = on_message
+        self.failed = set()
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.hooks)
+
+    def emit(self, name, event):
+        for hook in self.hooks:
+            try:
+                getattr(hook, name)(event)
+            except Exception as e:
+                with self.lock:
+                    first = (id(hook), name) not in self.failed
+                    self.failed.add((id(hook), name))
+                if first and self.on_message:
+                    self.on_message("warning", f"Hook {type(hook).__name__}.{name} failed: {e}")
+
+# Events built from result rows, shared by every runner so a hook sees the
+# same fields whichever one sent the request.
+def response_event(result_row, attempt, retry_in, sent=True):
+    return {
+        "row": result_row["Request #"], "attempt": attempt, "method": result_row["Method"], "url": result_row["URL"],
+        "status_code": result_row["Status Code"], "error_type": result_row.get("Error Type"),
+        "latency_ms": result_row.get("Latency (ms)"), "ttfb_ms": result_row.get("TTFB (ms)"),
+        "request_bytes": result_row["Request Size (B)"], "response_bytes": result_row.get("Response Size (B)"),
+        "cache": result_row.get("Cache"), "sent": sent, "will_retry": retry_in is not None, "result": result_row,
+    }
+
+def retry_event(result_row, attempt, retry_in):
+    return {
+        "row": result_row["Request #"], "attempt": attempt, "retry_in": retry_in,
+        "status_code": result_row["Status Code"], "error_type": result_row.get("Error Type"),
+    }
+
+def report_row_error(hooks, result_row):
+    # Called once a row has its final result.
+    if hooks and is_failure(result_row["Status Code"]):
+        hooks.emit("row_error", {
+            "row": result_row["Request #"], "attempts": result_row.get("Attempts", 1),
+            "status_code": result_row["Status Code"], "error": result_row["Error"],
+            "error_type": result_row.get("Error Type"), "elapsed_s": result_row.get("Elapsed (s)"), "result": result_row,
+        })
@@ -0,0 +1,219 @@
+import importlib.util
+import json
+import threading
+import time
+import weakref
+from datetime import timedelta
+from http import cookiejar
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_MAX_HOSTS = 32
+DEFAULT_PER_HOST = 64
+HTTP_VERSIONS = {"1.1": "HTTP/1.1", "2": "HTTP/2 (needs httpx)"}
+
+class NoCookiesPolicy(cookiejar.DefaultCookiePolicy):
+    # A shared session must not carry cookies from one row or one user's
+    # request into the next; every request starts as clean as it did
+    # with a throwaway session.
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._retired = {"requests": 0, "connections": 0}
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pools.dispose_func = self._retire_pool
+
+    def _retire_pool(self, pool):
+        with self._stats_lock:
+            self._retired["requests"] += pool.num_requests
+            self._retired["connections"] += pool.num_connections
+        pool.close()
+
+    def pool_stats(self):
+        with self._stats_lock:
+            stats = dict(self._retired)
+        pools = self.poolmanager.pools
+        with pools.lock:
+            live = list(pools._container.values())
+        for pool in live:
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+        return stats
+
+class ConnectError(requests.exceptions.ConnectionError):
+    # The connection was never made, so the request is safe to send again.
+    pass
+
+def require_http2():
+    # httpx only needs h2 once a connection negotiates HTTP/2, so check
+    # for it now rather than failing on the first request.
+    try:
+        import httpx
+    except ImportError:
+        httpx = None
+    if httpx is None or importlib.util.find_spec("h2") is None:
+        raise ImportError("HTTP/2 needs httpx with HTTP/2 support. Install it with pip install 'httpx[http2]' or use HTTP/1.1.")
+    return httpx
+
+def _translate_error(httpx, error):
+    # The rest of the engine (retries, error types) only knows requests'
+    # exceptions, so httpx errors are raised as their nearest equivalent.
+    message = str(error) or type(error).__name__
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(message)
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(message)
+    if isinstance(error, httpx.ConnectError):
+        return ConnectError(message)
+    if isinstance(error, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(message)
+    if isinstance(error, httpx.TransportError):
+        return requests.exceptions.ConnectionError(message)
+    return requests.exceptions.RequestException(message)
+
+class Http2Response:
+    # Just enough of requests.Response for the batch engine and the single
+    # request view.
+    def __init__(self, httpx, response, elapsed):
+        self._httpx = httpx
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.elapsed = elapsed
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def encoding(self):
+        return self._response.charset_encoding
+
+    @property
+    def bytes_downloaded(self):
+        return self._response.num_bytes_downloaded
+
+    def iter_content(self, chunk_size=1):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except self._httpx.HTTPError as e:
+            raise requests.exceptions.ChunkedEncodingError(str(e) or type(e).__name__)
+
+    @property
+    def content(self):
+        try:
+            return self._response.read()
+        except self._httpx.HTTPError as e:
+            raise _translate_error(self._httpx, e)
+
+    @property
+    def text(self):
+        self.content
+        return self._response.text
+
+    def json(self):
+        try:
+            return json.loads(self.text)
+        except json.JSONDecodeError as e:
+            raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+
+    def close(self):
+        self._response.close()
+
+class Http2Session:
+    # An httpx client behind the requests.Session.request() call the engine
+    # uses. Concurrent rows to one host share a connection as HTTP/2 streams;
+    # hosts that don't offer HTTP/2 fall back to HTTP/1.1 connections.
+    def __init__(self, max_hosts=DEFAULT_MAX_HOSTS, per_host=DEFAULT_PER_HOST):
+        self._httpx = httpx = require_http2()
+        self.client = httpx.Client(
+            http2=True, follow_redirects=True,
+            cookies=cookiejar.CookieJar(policy=NoCookiesPolicy()),
+            limits=httpx.Limits(max_connections=max_hosts * per_host, max_keepalive_connections=max_hosts * per_host),
+        )
+        self._stats_lock = threading.Lock()
+        self._streams = weakref.WeakSet()
+        self._stats = {"requests": 0, "connections": 0}
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return self._httpx.Timeout(read, connect=connect)
+        return self._httpx.Timeout(timeout)
+
+    def request(self, method, url, headers=None, timeout=None, stream=False, data=None, json=None):
+        httpx = self._httpx
+        options = {"json": json}
+        if isinstance(data, dict):
+            options["data"] = data
+        else:
+            options["content"] = data
+        started = time.perf_counter()
+        try:
+            request = self.client.build_request(method, url, headers=headers, timeout=self._timeout(timeout), **options)
+            response = self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise _translate_error(httpx, e)
+        wrapped = Http2Response(httpx, response, timedelta(seconds=time.perf_counter() - started))
+        self._count(response)
+        if not stream:
+            try:
+                wrapped.content
+            finally:
+                wrapped.close()
+        return wrapped
+
+    def _count(self, response):
+        network_stream = response.extensions.get("network_stream")
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            if network_stream is not None and network_stream not in self._streams:
+                self._streams.add(network_stream)
+                self._stats["connections"] += 1
+
+    def pool_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.client.close()
+
+def response_protocol(response):
+    if isinstance(response, Http2Response):
+        return response.http_version
+    version = getattr(response.raw, "version", None)
+    return {10: "HTTP/1.0", 11: "HTTP/1.1", 20: "HTTP/2"}.get(version, "HTTP/1.1")
+
+def create_session(max_hosts=DEFAULT_MAX_HOSTS, per_host=DEFAULT_PER_HOST, http2=False):
+    if http2:
+        return Http2Session(max_hosts, per_host)
+    session = requests.Session()
+    session.cookies.set_policy(NoCookiesPolicy())
+    for prefix in ("https://", "http://"):
+        session.mount(prefix, PooledAdapter(pool_connections=max_hosts, pool_maxsize=per_host))
+    return session
+
+def get_pool_stats(session):
+    if isinstance(session, Http2Session):
+        stats = session.pool_stats()
+        stats["reused"] = max(0, stats["requests"] - stats["connections"])
+        return stats
+    stats = {"requests": 0, "connections": 0}
+    for adapter in session.adapters.values():
+        if isinstance(adapter, PooledAdapter):
+            for key, value in adapter.pool_stats().items():
+                stats[key] += value
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    return stats
+
+def diff_pool_stats(before, after):
+    stats = {key: after[key] - before[key] for key in ("requests", "connections")}
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    return stats
@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from loopify.http_client import get_pool_stats, diff_pool_stats
+from loopify.utilities import run_batch_requests
+
+ACTIVE_STATUSES = ("queued", "running")
+MAX_MESSAGES = 50
+MAX_FINISHED_JOBS = 20
+
+class BatchJob:
+    def __init__(self, job_id, name, run_dir, target, options):
+        self.job_id = job_id
+        self.name = name
+        self.run_dir = run_dir
+        self.target = target
+        self.options = options
+        self.live = None
+        self.status = "queued"
+        self.completed = 0
+        self.submitted = 0
+        self.fraction = 0.0
+        self.progress_text = "Waiting to start..."
+        self.messages = []
+        self.dropped_messages = 0
+        self.summary = None
+        self.pool_stats = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def on_progress(self, completed, submitted, fraction, text, live=None):
+        with self.lock:
+            self.live = live
+            self.completed = completed
+            self.submitted = submitted
+            self.fraction = fraction
+            self.progress_text = text
+
+    def on_message(self, level, text):
+        with self.lock:
+            # Keep the first messages, which usually explain the rest,
+            # and only count the overflow.
+            if len(self.messages) < MAX_MESSAGES:
+                self.messages.append((level, text))
+            else:
+                self.dropped_messages += 1
+
+    def run(self):
+        self.status = "running"
+        session = self.options.get("session")
+        before = get_pool_stats(session) if session is not None else None
+        try:
+            summary = self.target(
+                on_progress=self.on_progress, on_message=self.on_message,
+                cancel_event=self.cancel_event, **self.options,
+            )
+        except Exception as e:
+            self.on_message("error", f"Batch failed: {e}")
+            summary = None
+        if before is not None:
+            self.pool_stats = diff_pool_stats(before, get_pool_stats(session))
+        with self.lock:
+            self.summary = summary
+            if summary is None:
+                self.status = "failed"
+            elif summary.get("cancelled"):
+                self.status = "cancelled"
+            else:
+                self.status = "done"
+                self.fraction = 1.0
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "job_id": self.job_id, "name": self.name, "status": self.status,
+                "completed": self.completed, "submitted": self.submitted,
+                "fraction": self.fraction, "progress_text": self.progress_text,
+                "messages": list(self.messages), "dropped_messages": self.dropped_messages,
+                "summary": self.summary, "pool_stats": self.pool_stats, "live": self.live,
+                "created_at": self.created_at, "finished_at": self.finished_at,
+            }
+
+class JobManager:
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def start(self, name, run_dir, target=run_batch_requests, **options):
+        with self.lock:
+            for job in self.jobs.values():
+                if job.active and job.run_dir == run_dir:
+                    raise ValueError(f"A batch for '{job.name}' is already running with these settings.")
+            # The manager is shared by every browser session, so finished
+            # jobs nobody dismissed are evicted oldest first.
+            finished = sorted((job for job in self.jobs.values() if not job.active), key=lambda job: job.finished_at)
+            for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS + 1)]:
+                del self.jobs[job.job_id]
+            job = BatchJob(uuid.uuid4().hex[:8], name, run_dir, target, options)
+            self.jobs[job.job_id] = job
+        job.thread = threading.Thread(target=job.run, name=f"loopify-batch-{job.job_id}", daemon=True)
+        job.thread.start()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def is_running(self, run_dir):
+        with self.lock:
+            return any(job.active and job.run_dir == run_dir for job in self.jobs.values())
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancel_event.set()
+
+    def remove(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job and not job.active:
+                del self.jobs[job_id]
@@ -0,0 +1,257 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from loopify.batch_io import iter_batch_chunks
+from loopify.capture import BodyCapture
+from loopify.hooks import HookSet, report_row_error
+from loopify.http_client import create_session
+from loopify.retries import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from loopify.stats import StreamingStats, LatencyHistogram, is_failure
+from loopify.utilities import (
+    prepare_batch_chunk, send_batch_request, notify,
+    format_validation_errors, MAX_REPORTED_ERRORS
+)
+
+MAX_SCENARIO_ROWS = 10000
+MAX_IN_FLIGHT = 512
+TICK_SECONDS = 1.0
+LIVE_WINDOW_SECONDS = 5.0
+LIVE_HISTORY_TICKS = 300
+# Load tests only keep stats, so bodies are counted and dropped.
+NO_BODIES = BodyCapture("none")
+
+def load_scenario(source, file_type):
+    specs = []
+    weights = []
+    errors = []
+    for chunk in iter_batch_chunks(source, file_type, extra_columns=['weight']):
+        chunk_specs, chunk_errors = prepare_batch_chunk(chunk)
+        errors.extend(chunk_errors)
+        raw = chunk['weight'].str.strip()
+        chunk_weights = pd.to_numeric(raw.mask(raw == '', '1'), errors='coerce')
+        for pos in chunk.index[~(chunk_weights >= 0)]:
+            errors.append((pos, f"Weight '{chunk.at[pos, 'weight']}' must be a number of 0 or more."))
+        specs.extend(chunk_specs)
+        weights.extend(chunk_weights.fillna(0).tolist())
+        if len(specs) > MAX_SCENARIO_ROWS:
+            raise ValueError(f"A load-test scenario can have at most {MAX_SCENARIO_ROWS} requests.")
+    if specs and not sum(weights):
+        errors.append((0, "At least one request needs a weight above 0."))
+    return specs, weights, sorted(errors)
+
+class LiveStats:
+    # Load tests run for a set time rather than a set number of rows, so
+    # everything here is bounded: the totals live in StreamingStats and the
+    # live window in one latency histogram per second.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = StreamingStats()
+        self.recent = deque()
+        self.history = deque(maxlen=LIVE_HISTORY_TICKS)
+        self.total = 0
+        self.failed = 0
+
+    def add(self, result_row):
+        failed = is_failure(result_row["Status Code"])
+        second = int(time.monotonic())
+        with self.lock:
+            self.stats.add(result_row)
+            if not self.recent or self.recent[-1][0] != second:
+                self.recent.append([second, 0, 0, LatencyHistogram()])
+            slot = self.recent[-1]
+            slot[1] += 1
+            slot[2] += failed
+            slot[3].add(float(result_row.get("Latency (ms)", np.nan)))
+            self.total += 1
+            self.failed += failed
+
+    def tick(self, elapsed, active_users, in_flight):
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and self.recent[0][0] < now - LIVE_WINDOW_SECONDS:
+                self.recent.popleft()
+            latencies = LatencyHistogram()
+            for _, _, _, histogram in self.recent:
+                latencies.merge(histogram)
+            p50, p95 = latencies.quantiles([0.5, 0.95]) if latencies.count else (None, None)
+            window = min(LIVE_WINDOW_SECONDS, max(elapsed, 1e-9))
+            point = {
+                "second": round(elapsed, 1),
+                "requests_per_s": sum(slot[1] for slot in self.recent) / window,
+                "errors_per_s": sum(slot[2] for slot in self.recent) / window,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "active_users": active_users,
+                "in_flight": in_flight,
+            }
+            self.history.append(point)
+            return {"total": self.total, "failed": self.failed, "current": point, "history": list(self.history)}
+
+def arrival_offset(n, arrival_rate, ramp_up):
+    # Seconds from the start until the n-th arrival when the rate climbs
+    # linearly from 0 to arrival_rate over ramp_up, then holds.
+    ramp_arrivals = arrival_rate * ramp_up / 2
+    if n <= ramp_arrivals:
+        return math.sqrt(2 * n * ramp_up / arrival_rate)
+    return ramp_up + (n - ramp_arrivals) / arrival_rate
+
+def run_load_test(source, file_type, users=10, arrival_rate=None, ramp_up=0, duration=60,
+                  think_time=0, session=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                  read_timeout=DEFAULT_READ_TIMEOUT, max_in_flight=MAX_IN_FLIGHT,
+                  on_progress=None, on_message=None, cancel_event=None, hooks=None):
+    try:
+        specs, weights, problems = load_scenario(source, file_type)
+    except Exception as e:
+        notify(on_message, "error", f"Error parsing file: {e}")
+        return None
+    if problems:
+        notify(on_message, "error", format_validation_errors(problems[:MAX_REPORTED_ERRORS], len(problems), len(specs)))
+        return None
+    if not specs:
+        notify(on_message, "error", "The scenario file has no requests.")
+        return None
+    open_loop = bool(arrival_rate)
+    users = max(1, int(users))
+    if not open_loop and users > max_in_flight:
+        raise ValueError(f"A load test can run at most {max_in_flight} virtual users.")
+    workers = min(max_in_flight, users) if not open_loop else max_in_flight
+    own_session = session is None
+    if own_session:
+        session = create_session(per_host=workers)
+    timeout = (connect_timeout, read_timeout)
+    hooks = HookSet(hooks, on_message) if hooks else None
+    cum_weights = np.cumsum(weights).tolist()
+    live = LiveStats()
+    stop = threading.Event()
+    counters = {"active_users": 0, "in_flight": 0, "dropped": 0, "crashed": 0}
+    crashes = []
+    counters_lock = threading.Lock()
+    start = time.monotonic()
+    deadline = start + duration
+
+    def send_one(rng, reserved=False):
+        spec = rng.choices(specs, cum_weights=cum_weights)[0]
+        if not reserved:
+            with counters_lock:
+                counters["in_flight"] += 1
+        started_at = time.time()
+        try:
+            result_row, _ = send_batch_request(session, spec, timeout=timeout, capture=NO_BODIES, hooks=hooks)
+        finally:
+            with counters_lock:
+                counters["in_flight"] -= 1
+        result_row["Started At"] = started_at
+        result_row["Attempts"] = 1
+        result_row["Elapsed (s)"] = round(result_row["Latency (ms)"] / 1000, 3)
+        live.add(result_row)
+        report_row_error(hooks, result_row)
+
+    def virtual_user(index):
+        # Users start evenly spread across the ramp-up, then loop closed:
+        # each waits for its response (and think time) before sending again.
+        rng = random.Random()
+        if stop.wait(ramp_up * index / users):
+            return
+        with counters_lock:
+            counters["active_users"] += 1
+        try:
+            while not stop.is_set() and time.monotonic() < deadline:
+                send_one(rng)
+                if think_time and stop.wait(think_time):
+                    break
+        finally:
+            with counters_lock:
+                counters["active_users"] -= 1
+
+    def record_crash(future):
+        # send_one turns request failures into result rows, so anything raised
+        # here is a bug (or a hook blowing up) and must not vanish with the future.
+        error = future.exception()
+        if error is not None:
+            with counters_lock:
+                counters["crashed"] += 1
+                if not crashes:
+                    crashes.append(error)
+
+    def report_progress():
+        elapsed = time.monotonic() - start
+        with counters_lock:
+            snapshot = live.tick(elapsed, counters["active_users"], counters["in_flight"])
+        current = snapshot["current"]
+        p95 = f"{current['p95_ms']:.0f} ms" if current["p95_ms"] is not None else "n/a"
+        text = (f"{min(elapsed, duration):.0f}/{duration:.0f} s · {current['requests_per_s']:.1f} req/s · "
+                f"p95 {p95} · {snapshot['failed']} failed of {snapshot['total']}")
+        if on_progress:
+            on_progress(snapshot["total"], snapshot["total"], min(1.0, elapsed / duration), text, live=snapshot)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loopify-load")
+    try:
+        if open_loop:
+            rng = random.Random()
+            arrivals = 0
+            next_tick = start + TICK_SECONDS
+            while not stop.is_set():
+                now = time.monotonic()
+                if now >= deadline or (cancel_event is not None and cancel_event.is_set()):
+                    stop.set()
+                    break
+                if now >= next_tick:
+                    report_progress()
+                    next_tick += TICK_SECONDS
+                next_arrival = start + arrival_offset(arrivals + 1, arrival_rate, ramp_up)
+                if now < next_arrival:
+                    time.sleep(max(0.0, min(next_arrival, next_tick, deadline) - now))
+                    continue
+                arrivals += 1
+                # Open loop: arrivals keep their schedule however slow the
+                # server gets. When every slot is busy the arrival is counted
+                # as dropped rather than queued, which would hide the overload.
+                with counters_lock:
+                    busy = counters["in_flight"] >= workers
+                    if not busy:
+                        counters["in_flight"] += 1
+                if busy:
+                    counters["dropped"] += 1
+                else:
+                    executor.submit(send_one, rng, True).add_done_callback(record_crash)
+        else:
+            for index in range(users):
+                executor.submit(virtual_user, index).add_done_callback(record_crash)
+            while not stop.wait(TICK_SECONDS):
+                report_progress()
+                if time.monotonic() >= deadline or (cancel_event is not None and cancel_event.is_set()):
+                    stop.set()
+        executor.shutdown(wait=True)
+        report_progress()
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+        if own_session:
+            session.close()
+    cancelled = cancel_event is not None and cancel_event.is_set()
+    summary = {
+        "output_path": None, "rows": live.total, "errors": live.stats.status_classes.get("ERROR", 0),
+        "cancelled": cancelled, "report": live.stats.report(),
+        "load_test": {
+            "model": "open" if open_loop else "closed",
+            "users": None if open_loop else users, "arrival_rate": arrival_rate if open_loop else None,
+            "ramp_up": ramp_up, "duration": duration, "think_time": think_time,
+            "dropped": counters["dropped"], "crashed": counters["crashed"], "scenario_requests": len(specs),
+        },
+    }
+    if hooks:
+        hooks.emit("batch_finished", summary)
+    if counters["dropped"]:
+        notify(on_message, "warning", f"{counters['dropped']} arrivals were dropped because {workers} requests were already in flight; "
+                                      "the target can't keep up with this arrival rate.")
+    if crashes:
+        failed = "virtual users" if not open_loop else "requests"
+        notify(on_message, "error", f"{counters['crashed']} {failed} stopped on an unexpected error: "
+                                    f"{type(crashes[0]).__name__}: {crashes[0]}")
+    notify(on_message, "success", "Load test stopped early." if cancelled else "Load test complete!")
+    return summary
@@ -0,0 +1,143 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from loopify.hooks import BatchHook
+from loopify.stats import LATENCY_BUCKETS_MS, status_class
+
+METRICS_FORMATS = {"prometheus": "Prometheus text", "json": "JSON"}
+DEFAULT_WRITE_INTERVAL = 1.0
+
+def metrics_format_for(path):
+    return "json" if path.lower().endswith(".json") else "prometheus"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+class MetricsExporter(BatchHook):
+    # Keeps counters and a latency histogram for a running batch and rewrites
+    # a Prometheus text or JSON file at most once per interval, so a node
+    # exporter textfile collector or any dashboard can follow the run.
+    def __init__(self, path, output_format=None, interval=DEFAULT_WRITE_INTERVAL, labels=None):
+        self.path = path
+        self.output_format = output_format or metrics_format_for(path)
+        if self.output_format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format '{self.output_format}'.")
+        self.interval = interval
+        self.labels = dict(labels or {})
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.last_write = 0.0
+        self.done = False
+        self.in_flight = 0
+        self.responses = Counter()
+        self.cache = Counter()
+        self.retries = 0
+        self.row_errors = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum_ms = 0.0
+        self.latency_count = 0
+
+    def before_send(self, event):
+        with self.lock:
+            self.in_flight += 1
+            self.bytes_sent += event["request_bytes"]
+
+    def after_response(self, event):
+        with self.lock:
+            if event["sent"]:
+                self.in_flight -= 1
+            self.responses[status_class(event["status_code"])] += 1
+            if event["cache"]:
+                self.cache[event["cache"]] += 1
+            self.bytes_received += event["response_bytes"] or 0
+            latency = event["latency_ms"]
+            if latency is not None and not math.isnan(latency):
+                index = next((i for i, edge in enumerate(LATENCY_BUCKETS_MS) if latency <= edge), len(LATENCY_BUCKETS_MS))
+                self.buckets[index] += 1
+                self.latency_sum_ms += latency
+                self.latency_count += 1
+        self.write()
+
+    def retry(self, event):
+        with self.lock:
+            self.retries += 1
+
+    def row_error(self, event):
+        with self.lock:
+            self.row_errors[event["error_type"] or status_class(event["status_code"])] += 1
+
+    def batch_finished(self, summary):
+        self.done = True
+        self.write(force=True)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "labels": self.labels, "started_at": self.started_at, "updated_at": time.time(), "done": self.done,
+                "in_flight": self.in_flight, "responses": dict(self.responses), "cache": dict(self.cache),
+                "retries": self.retries, "row_errors": dict(self.row_errors),
+                "bytes_sent": self.bytes_sent, "bytes_received": self.bytes_received,
+                "latency_ms": {
+                    "buckets": [{"le": edge, "count": count} for edge, count in zip(LATENCY_BUCKETS_MS + ["+Inf"], self.buckets)],
+                    "sum": self.latency_sum_ms, "count": self.latency_count,
+                },
+            }
+
+    def render_prometheus(self, snapshot):
+        labels = snapshot["labels"]
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP loopify_{name} {help_text}")
+            lines.append(f"# TYPE loopify_{name} {kind}")
+            for extra, value in samples:
+                lines.append(f"loopify_{name}{_labels({**labels, **extra})} {value}")
+
+        metric("responses_total", "counter", "Finished attempts by status class (ERROR = no response).",
+               [({"status": klass}, count) for klass, count in sorted(snapshot["responses"].items())])
+        metric("cache_total", "counter", "Rows answered through the response cache, by outcome.",
+               [({"outcome": outcome}, count) for outcome, count in sorted(snapshot["cache"].items())])
+        metric("retries_total", "counter", "Attempts that were scheduled for a retry.", [({}, snapshot["retries"])])
+        metric("row_errors_total", "counter", "Rows that ended with a transport error or a 5xx.",
+               [({"type": kind}, count) for kind, count in sorted(snapshot["row_errors"].items())])
+        metric("request_bytes_total", "counter", "Request body bytes sent.", [({}, snapshot["bytes_sent"])])
+        metric("response_bytes_total", "counter", "Response body bytes received.", [({}, snapshot["bytes_received"])])
+        metric("in_flight_requests", "gauge", "Requests currently waiting for a response.", [({}, snapshot["in_flight"])])
+        metric("batch_done", "gauge", "1 once the batch has finished.", [({}, int(snapshot["done"]))])
+        latency = snapshot["latency_ms"]
+        cumulative = 0
+        samples = []
+        for bucket in latency["buckets"]:
+            cumulative += bucket["count"]
+            le = bucket["le"] if bucket["le"] == "+Inf" else f"{bucket['le'] / 1000:g}"
+            samples.append(({"le": le}, cumulative))
+        metric("request_duration_seconds", "histogram", "Latency of each attempt, including reading the body.", [])
+        lines += [f"loopify_request_duration_seconds_bucket{_labels({**labels, **extra})} {value}" for extra, value in samples]
+        lines.append(f"loopify_request_duration_seconds_sum{_labels(labels)} {latency['sum'] / 1000}")
+        lines.append(f"loopify_request_duration_seconds_count{_labels(labels)} {latency['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_write < self.interval:
+                return
+            self.last_write = now
+        snapshot = self.snapshot()
+        text = json.dumps(snapshot, indent=2) if self.output_format == "json" else self.render_prometheus(snapshot)
+        # Written next to the target and renamed over it, so readers never
+        # see a half-written file.
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,128 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = {429, 503}
+DEFAULT_BACKOFF = 1.0
+MAX_RETRY_AFTER = 120.0
+MIN_RATE_FRACTION = 0.05
+RAMP_UP_FRACTION = 0.05
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+class TokenBucket:
+    def __init__(self, rate=None, burst=1, adaptive=True):
+        self.target_rate = rate
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self.adaptive = adaptive
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_backoff = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        # Takes a token now and returns how long the caller must wait before
+        # using it. Tokens may go negative, which queues callers in arrival
+        # order instead of having every worker poll the bucket.
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.paused_until)
+            if not self.rate:
+                return start - now
+            self._refill(now)
+            self.tokens -= 1
+            if self.tokens < 0:
+                start = max(start, now - self.tokens / self.rate)
+            return start - now
+
+    def back_off(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            # Halve at most once per window so a burst of 429s from
+            # in-flight requests counts as a single signal.
+            window = retry_after if retry_after is not None else DEFAULT_BACKOFF
+            if self.adaptive and self.rate and now - self.last_backoff >= window:
+                self._refill(now)
+                self.rate = max(self.target_rate * MIN_RATE_FRACTION, self.rate / 2)
+                self.tokens = min(self.tokens, 0.0)
+                self.last_backoff = now
+
+    def ramp_up(self):
+        if not self.adaptive or not self.rate or self.rate >= self.target_rate:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.target_rate, self.rate + self.target_rate * RAMP_UP_FRACTION)
+
+class RateLimiter:
+    def __init__(self, rps=None, burst=1, per_host_rps=None, adaptive=True):
+        self.burst = burst
+        self.per_host_rps = per_host_rps
+        self.adaptive = adaptive
+        self.global_bucket = TokenBucket(rps, burst, adaptive)
+        self.host_buckets = {}
+        self.lock = threading.Lock()
+
+    def _host_bucket(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            bucket = self.host_buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.per_host_rps, self.burst, self.adaptive)
+                self.host_buckets[host] = bucket
+            return bucket
+
+    def _feedback_bucket(self, url):
+        if self.per_host_rps or not self.global_bucket.rate:
+            return self._host_bucket(url)
+        return self.global_bucket
+
+    def acquire(self, url):
+        wait = max(self.global_bucket.reserve(), self._host_bucket(url).reserve())
+        if wait > 0:
+            time.sleep(wait)
+
+    def record(self, url, status_code, headers=None):
+        retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+        bucket = self._feedback_bucket(url)
+        if status_code in THROTTLE_STATUSES or retry_after is not None:
+            bucket.back_off(retry_after)
+        else:
+            bucket.ramp_up()
+
+    def current_rates(self):
+        rates = {"*": self.global_bucket.rate}
+        with self.lock:
+            for host, bucket in self.host_buckets.items():
+                rates[host] = bucket.rate
+        return rates
+
+def create_rate_limiter(delay=0, rps=None, burst=1, per_host_rps=None, adaptive=True):
+    if not rps and delay and delay > 0:
+        rps, burst = 1.0 / delay, 1
+    return RateLimiter(rps or None, burst, per_host_rps or None, adaptive)
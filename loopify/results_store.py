@@ -0,0 +1,156 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from loopify.batch_io import iter_result_chunks, result_row_offsets, read_result_value, RESULT_COLUMNS
+from loopify.stats import SKIPPED, FAILED_CLASSES
+
+# Result files keep everything as text (or as whatever JSON gave back), so
+# status codes mix ints with "ERROR" and bodies mix JSON with plain text.
+# The store turns them into typed columns once and hands the UI one small
+# Arrow slice per page. Bodies stay in the file and are read back one row
+# at a time, from the offset where that row starts.
+RESULT_SCHEMA = pa.schema([
+    ("Request #", pa.int64()),
+    ("Method", pa.string()),
+    ("URL", pa.string()),
+    ("Status Code", pa.int16()),
+    ("Status", pa.string()),
+    ("Error", pa.string()),
+    ("Error Type", pa.string()),
+    ("Attempts", pa.int32()),
+    ("Elapsed (s)", pa.float64()),
+    ("Latency (ms)", pa.float64()),
+    ("TTFB (ms)", pa.float64()),
+    ("Request Size (B)", pa.int64()),
+    ("Response Size (B)", pa.int64()),
+    ("Started At", pa.timestamp("ms", tz="UTC")),
+    ("Body Truncated", pa.bool_()),
+    ("Cache", pa.string()),
+    ("Workflow #", pa.int64()),
+    ("Step", pa.string()),
+])
+GROUP_BY = ["Status", "Status Code", "Method", "Host", "Error Type", "Cache", "Step"]
+LOAD_CHUNK_ROWS = 50000
+MISSING_TEXT = ("", "N/A")
+HOST_PATTERN = r"^[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^@/?#]*@)?(?P<host>[^/?#]+)"
+
+def _text(series):
+    values = series.where(series.notna(), "").astype(str)
+    return pa.array(values.to_numpy(dtype=object), type=pa.string(), mask=values.isin(MISSING_TEXT).to_numpy())
+
+def _numbers(series, arrow_type):
+    return pa.array(pd.to_numeric(series, errors="coerce"), type=arrow_type, from_pandas=True)
+
+def typed_batch(chunk):
+    # Files from older runs may lack the newer columns.
+    chunk = chunk.reindex(columns=RESULT_COLUMNS)
+    status = pd.to_numeric(chunk["Status Code"], errors="coerce")
+    status_class = ((status // 100).astype("Int64").astype("string") + "xx").fillna("ERROR")
+    status_class[chunk["Status Code"].eq(SKIPPED).to_numpy()] = SKIPPED
+    started_ms = (pd.to_numeric(chunk["Started At"], errors="coerce") * 1000).round()
+    columns = {
+        "Request #": _numbers(chunk["Request #"], pa.int64()),
+        "Method": _text(chunk["Method"]),
+        "URL": _text(chunk["URL"]),
+        "Status Code": pa.array(status, type=pa.int16(), from_pandas=True),
+        "Status": pa.array(status_class.to_numpy(dtype=object), type=pa.string()),
+        "Error": _text(chunk["Error"]),
+        "Error Type": _text(chunk["Error Type"]),
+        "Attempts": _numbers(chunk["Attempts"], pa.int32()),
+        "Elapsed (s)": _numbers(chunk["Elapsed (s)"], pa.float64()),
+        "Latency (ms)": _numbers(chunk["Latency (ms)"], pa.float64()),
+        "TTFB (ms)": _numbers(chunk["TTFB (ms)"], pa.float64()),
+        "Request Size (B)": _numbers(chunk["Request Size (B)"], pa.int64()),
+        "Response Size (B)": _numbers(chunk["Response Size (B)"], pa.int64()),
+        "Started At": pa.array(started_ms, type=pa.int64(), from_pandas=True).cast(RESULT_SCHEMA.field("Started At").type),
+        "Body Truncated": pa.array(chunk["Body Truncated"].isin([True, "True", "true"]), type=pa.bool_()),
+        "Cache": _text(chunk["Cache"]),
+        "Workflow #": _numbers(chunk["Workflow #"], pa.int64()),
+        "Step": _text(chunk["Step"]),
+    }
+    return pa.RecordBatch.from_pydict(columns, schema=RESULT_SCHEMA)
+
+class ResultsStore:
+    def __init__(self, table, path, output_format, offsets):
+        self.table = table
+        self.path = path
+        self.output_format = output_format
+        self.offsets = offsets
+        self.hosts = None
+        self.workflows = table["Step"].null_count < table.num_rows
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def column(self, name):
+        if name != "Host":
+            return self.table[name]
+        if self.hosts is None:
+            self.hosts = pc.struct_field(pc.extract_regex(self.table["URL"], HOST_PATTERN), [0])
+        return self.hosts
+
+    def status_counts(self):
+        counts = pc.value_counts(self.table["Status"]).to_pylist()
+        return {item["values"]: item["counts"] for item in sorted(counts, key=lambda item: item["values"])}
+
+    def filter(self, statuses=None, url=None, error=None):
+        # Returns the positions of the matching rows, or None when nothing
+        # is filtered, so paging an unfiltered run never builds an index.
+        masks = []
+        if statuses:
+            masks.append(pc.is_in(self.table["Status"], value_set=pa.array(statuses, type=pa.string())))
+        if url:
+            masks.append(pc.match_substring(self.table["URL"], url, ignore_case=True))
+        if error:
+            masks.append(pc.or_kleene(
+                pc.match_substring(self.table["Error"], error, ignore_case=True),
+                pc.match_substring(self.table["Error Type"], error, ignore_case=True),
+            ))
+        if not masks:
+            return None
+        mask = masks[0]
+        for other in masks[1:]:
+            mask = pc.and_kleene(mask, other)
+        return pc.indices_nonzero(pc.fill_null(mask, False))
+
+    def page(self, positions, offset, limit):
+        # Returns the page and the store positions of its rows.
+        if positions is None:
+            page = self.table.slice(offset, limit)
+            return page, list(range(offset, offset + page.num_rows))
+        chosen = positions.slice(offset, limit)
+        return self.table.take(chosen), chosen.to_pylist()
+
+    def body(self, position):
+        body = read_result_value(self.path, self.output_format, self.offsets[position], "Response Body")
+        return body if isinstance(body, str) or body is None else str(body)
+
+    def aggregate(self, by, positions=None):
+        table = pa.table({
+            by: self.column(by),
+            "failed": pc.is_in(self.table["Status"], value_set=pa.array(FAILED_CLASSES)),
+            "latency": self.table["Latency (ms)"],
+            "size": self.table["Response Size (B)"],
+        })
+        if positions is not None:
+            table = table.take(positions)
+        grouped = table.group_by(by).aggregate([
+            ([], "count_all"), ("failed", "sum"), ("latency", "mean"),
+            ("latency", "tdigest", pc.TDigestOptions(q=[0.5, 0.9, 0.99])), ("latency", "max"), ("size", "sum"),
+        ])
+        quantiles = grouped["latency_tdigest"].combine_chunks().flatten().to_numpy(zero_copy_only=False).reshape(-1, 3)
+        frame = pd.DataFrame({
+            by: grouped[by].to_pylist(),
+            "Requests": grouped["count_all"].to_numpy(),
+            "Failed": grouped["failed_sum"].to_numpy(),
+            "Mean (ms)": grouped["latency_mean"].to_numpy(zero_copy_only=False),
+            "p50 (ms)": quantiles[:, 0], "p90 (ms)": quantiles[:, 1], "p99 (ms)": quantiles[:, 2],
+            "Max (ms)": grouped["latency_max"].to_numpy(zero_copy_only=False),
+            "Response bytes": grouped["size_sum"].to_numpy(zero_copy_only=False),
+        })
+        return frame.sort_values("Requests", ascending=False, ignore_index=True)
+
+def load_results_store(path, output_format):
+    batches = [typed_batch(chunk) for chunk in iter_result_chunks(path, output_format, chunk_rows=LOAD_CHUNK_ROWS)]
+    table = pa.Table.from_batches(batches, schema=RESULT_SCHEMA).combine_chunks()
+    return ResultsStore(table, path, output_format, result_row_offsets(path, output_format))
@@ -0,0 +1,84 @@
+import random
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from loopify.rate_limit import parse_retry_after
+from loopify.http_client import ConnectError
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_RETRY_ERRORS = ("connect", "read_timeout", "connection")
+RETRY_ERROR_TYPES = {
+    "connect": "Connection refused or connect timeout",
+    "read_timeout": "Read timeout",
+    "connection": "Connection dropped mid-request",
+}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# The server turned these away without processing them, so even a POST
+# can be sent again.
+REJECTED_STATUSES = {429, 503}
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 10.0
+
+def classify_error(error):
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return "connect"
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return "read_timeout"
+    if isinstance(error, requests.exceptions.SSLError):
+        return None
+    if isinstance(error, ConnectError):
+        return "connect"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = error.args[0] if error.args else None
+        if isinstance(reason, MaxRetryError) and isinstance(reason.reason, NewConnectionError):
+            return "connect"
+        return "connection"
+    if isinstance(error, requests.exceptions.ChunkedEncodingError):
+        return "connection"
+    return None
+
+class RetryPolicy:
+    def __init__(self, max_attempts=1, backoff_base=0.5, backoff_max=30.0, jitter=True,
+                 retry_statuses=DEFAULT_RETRY_STATUSES, retry_errors=DEFAULT_RETRY_ERRORS,
+                 retry_non_idempotent=False, respect_retry_after=True):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_statuses = set(retry_statuses)
+        self.retry_errors = set(retry_errors)
+        self.retry_non_idempotent = retry_non_idempotent
+        self.respect_retry_after = respect_retry_after
+
+    def backoff(self, attempt, retry_after=None):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        if self.jitter:
+            # Full jitter: rows that failed together spread out instead of
+            # hitting the upstream again in lockstep.
+            delay = random.uniform(0, delay)
+        if self.respect_retry_after and retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def retry_delay(self, attempt, method, status_code=None, headers=None, error=None):
+        if attempt >= self.max_attempts:
+            return None
+        safe = self.retry_non_idempotent or method in IDEMPOTENT_METHODS
+        if error is not None:
+            kind = classify_error(error)
+            if kind not in self.retry_errors or not (safe or kind == "connect"):
+                return None
+            return self.backoff(attempt)
+        if status_code not in self.retry_statuses or not (safe or status_code in REJECTED_STATUSES):
+            return None
+        retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+        return self.backoff(attempt, retry_after)
+
+def parse_status_list(text):
+    statuses = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if not part.isdigit() or not 100 <= int(part) <= 599:
+            raise ValueError(f"'{part}' is not an HTTP status code.")
+        statuses.append(int(part))
+    return statuses
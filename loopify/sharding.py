@@ -0,0 +1,207 @@
+import heapq
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from loopify.batch_io import create_result_sink, iter_result_chunks, new_run_dir, results_path, truncate_results
+from loopify.http_client import create_session, get_pool_stats, require_http2
+from loopify.compression import check_encoding
+from loopify.stats import BatchStats
+from loopify.utilities import run_batch_requests, validate_batch, format_validation_errors, notify
+
+MAX_PROCESSES = os.cpu_count() or 1
+PROGRESS_INTERVAL = 0.5
+EVENT_POLL_SECONDS = 0.2
+
+def shard_path(output_path, index):
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.shard{index + 1}{ext}"
+
+def split_limits(count, concurrency=1, rps=None, burst=1, per_host_rps=None, delay=0):
+    # Every shard gets an equal share of the limits, so together the
+    # processes keep to the rates set for the whole batch.
+    return {
+        "concurrency": max(1, math.ceil(concurrency / count)),
+        "rps": rps / count if rps else rps,
+        "burst": max(1, math.ceil(burst / count)),
+        "per_host_rps": per_host_rps / count if per_host_rps else per_host_rps,
+        "delay": delay * count if delay else delay,
+    }
+
+def _run_shard(index, count, source, file_type, options, events, stop):
+    # Ctrl+C in a terminal reaches every process in the group; the parent
+    # turns it into the stop event so shards still write what finished.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    last_progress = 0.0
+
+    def on_progress(completed, submitted, fraction, text, live=None):
+        nonlocal last_progress
+        now = time.monotonic()
+        if now - last_progress >= PROGRESS_INTERVAL:
+            last_progress = now
+            events.put(("progress", index, completed))
+
+    def on_message(level, text):
+        events.put(("message", index, level, text))
+
+    session = create_session(per_host=options["concurrency"], http2=options.get("http2", False))
+    try:
+        summary = run_batch_requests(
+            source, file_type, session=session, shard=(index, count), validate=False,
+            on_progress=on_progress, on_message=on_message, cancel_event=stop, **options,
+        )
+        if summary is not None:
+            summary["pool_stats"] = get_pool_stats(session)
+    except Exception as e:
+        on_message("error", f"Shard failed: {e}")
+        summary = None
+    finally:
+        session.close()
+    events.put(("done", index, summary))
+
+def _iter_rows(path, output_format):
+    for chunk in iter_result_chunks(path, output_format):
+        yield from chunk.to_dict('records')
+
+def _shard_breakdown(index, summary):
+    if summary is None:
+        return {"shard": index + 1, "status": "failed", "rows": 0, "errors": 0, "throughput_rps": None,
+                "p50_ms": None, "p90_ms": None, "connections": None}
+    report = summary["report"]
+    return {
+        "shard": index + 1, "status": "cancelled" if summary["cancelled"] else "done",
+        "rows": summary["rows"], "errors": summary["errors"],
+        "throughput_rps": report["throughput_rps"],
+        "p50_ms": report["latency_ms"].get("p50"), "p90_ms": report["latency_ms"].get("p90"),
+        "connections": summary["pool_stats"]["connections"],
+    }
+
+def run_sharded_batch(source, file_type, processes=2, delay=0, concurrency=1, rps=None, burst=1,
+                      per_host_rps=None, output_path=None, output_format="csv",
+                      on_progress=None, on_message=None, cancel_event=None,
+                      send_invalid=False, session=None, **options):
+    limits = {"delay": delay, "concurrency": concurrency, "rps": rps, "burst": burst, "per_host_rps": per_host_rps}
+    if processes <= 1:
+        return run_batch_requests(
+            source, file_type, session=session, output_path=output_path, output_format=output_format,
+            on_progress=on_progress, on_message=on_message, cancel_event=cancel_event,
+            send_invalid=send_invalid, **limits, **options,
+        )
+    if not isinstance(source, (str, os.PathLike)):
+        notify(on_message, "error", "Sharded runs need the batch file saved to disk.")
+        return None
+    if options.get("hooks"):
+        notify(on_message, "error", "Hooks and live metrics need a single worker process.")
+        return None
+    try:
+        check_encoding(options.get("compression", "none"))
+        if options.get("http2"):
+            require_http2()
+    except (ValueError, ImportError) as e:
+        notify(on_message, "error", str(e))
+        return None
+    try:
+        report = validate_batch(source, file_type)
+    except Exception as e:
+        notify(on_message, "error", f"Error parsing file: {e}")
+        return None
+    total = report["rows"]
+    if report["error_count"]:
+        message = format_validation_errors(report["errors"], report["error_count"], total)
+        if not send_invalid:
+            notify(on_message, "error", message)
+            return None
+        notify(on_message, "warning", message)
+    if output_path is None:
+        output_path = results_path(new_run_dir(), output_format)
+    count = max(1, min(int(processes), total))
+    shard_options = {**options, **split_limits(count, **limits), "output_format": output_format, "send_invalid": send_invalid}
+
+    # Spawned rather than forked: the parent may be a Streamlit server with
+    # many threads, which fork doesn't copy safely.
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    stop = context.Event()
+    workers = []
+    for index in range(count):
+        worker = context.Process(
+            target=_run_shard, name=f"loopify-shard-{index + 1}", daemon=True,
+            args=(index, count, os.fspath(source), file_type,
+                  {**shard_options, "output_path": shard_path(output_path, index)}, events, stop),
+        )
+        worker.start()
+        workers.append(worker)
+
+    completed = [0] * count
+    summaries = {}
+    last_progress = 0.0
+    while len(summaries) < count:
+        if cancel_event is not None and cancel_event.is_set():
+            stop.set()
+        try:
+            event = events.get(timeout=EVENT_POLL_SECONDS)
+        except queue.Empty:
+            for index, worker in enumerate(workers):
+                # A clean exit always sends "done" first; anything else died.
+                if index not in summaries and worker.exitcode not in (None, 0):
+                    notify(on_message, "error", f"Shard {index + 1} exited unexpectedly (code {worker.exitcode}).")
+                    summaries[index] = None
+            continue
+        kind, index = event[:2]
+        if kind == "progress":
+            completed[index] = event[2]
+        elif kind == "message":
+            level, text = event[2:]
+            if level != "success":
+                notify(on_message, level, f"Shard {index + 1}: {text}")
+        else:
+            summaries[index] = event[2]
+            if event[2] is not None:
+                completed[index] = event[2]["rows"]
+        now = time.monotonic()
+        if on_progress and (now - last_progress >= PROGRESS_INTERVAL or len(summaries) == count):
+            last_progress = now
+            done = sum(completed)
+            on_progress(done, total, done / total if total else 1.0,
+                        f"{done} of {total} rows complete across {count} processes.")
+    for worker in workers:
+        worker.join()
+
+    finished = [index for index in range(count) if summaries.get(index) is not None]
+    if not finished:
+        return None
+    # Each shard file is already in row order, so a k-way merge on the row
+    # number restores the original order without loading any shard whole.
+    truncate_results(output_path, 0)
+    sink = create_result_sink(output_path, output_format)
+    stats = BatchStats()
+    try:
+        streams = [_iter_rows(shard_path(output_path, index), output_format) for index in finished]
+        for result_row in heapq.merge(*streams, key=lambda row: int(row["Request #"])):
+            sink.write(result_row)
+            stats.add(result_row)
+    finally:
+        sink.close()
+    for index in range(count):
+        path = shard_path(output_path, index)
+        if os.path.exists(path):
+            os.remove(path)
+
+    was_cancelled = stop.is_set() or any(summaries[index]["cancelled"] for index in finished)
+    missing = [str(index + 1) for index in range(count) if index not in finished]
+    if missing:
+        notify(on_message, "warning", f"Results are missing the rows of shard {', '.join(missing)}.")
+    summary = {
+        "output_path": output_path, "output_format": output_format,
+        "rows": sum(summaries[index]["rows"] for index in finished),
+        "errors": sum(summaries[index]["errors"] for index in finished),
+        "resumed": 0, "cancelled": was_cancelled, "report": stats.report(),
+        "shards": [_shard_breakdown(index, summaries.get(index)) for index in range(count)],
+    }
+    if was_cancelled:
+        notify(on_message, "warning", f"Batch cancelled after {summary['rows']} rows.")
+    else:
+        notify(on_message, "success", "Batch complete!")
+    return summary
@@ -0,0 +1,283 @@
+import math
+from array import array
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+MAX_TIMELINE_BUCKETS = 120
+# Log-spaced latency buckets 1% apart from 10 µs to about six hours, so a
+# percentile read from them is within 1% of the exact one.
+HISTOGRAM_MIN_MS = 0.01
+HISTOGRAM_GROWTH = 1.01
+HISTOGRAM_SIZE = math.ceil(math.log(6 * 3600 * 1000 / HISTOGRAM_MIN_MS) / math.log(HISTOGRAM_GROWTH)) + 1
+# Workflow steps left unsent because an earlier step failed.
+SKIPPED = "SKIPPED"
+# Rows answered from the response cache without a send. Their lookup time
+# says nothing about the server, so they stay out of the latency figures.
+CACHE_HIT = "hit"
+# What counts as a failed request everywhere: no response, or a 5xx. A 4xx
+# is the server answering as designed, so it is reported but not failed.
+FAILED_CLASSES = ("ERROR", "5xx")
+
+def status_class(status):
+    if status == SKIPPED:
+        return SKIPPED
+    try:
+        return f"{int(status) // 100}xx"
+    except (TypeError, ValueError):
+        return "ERROR"
+
+def is_failure(status):
+    return status_class(status) in FAILED_CLASSES
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number
+
+def _count(value):
+    number = _number(value)
+    return 0 if math.isnan(number) else int(number)
+
+class BatchStats:
+    # Keeps only numeric columns in compact arrays, so a report over a
+    # million rows costs a few tens of MB no matter how large the bodies were.
+    def __init__(self):
+        self.starts = array('d')
+        self.latencies = array('d')
+        self.ttfbs = array('d')
+        self.failed = array('b')
+        self.hits = array('b')
+        self.status_classes = Counter()
+        self.error_types = Counter()
+        self.cache = Counter()
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def add(self, result_row):
+        klass = status_class(result_row.get("Status Code"))
+        self.status_classes[klass] += 1
+        if klass == SKIPPED:
+            return
+        if klass == "ERROR":
+            self.error_types[result_row.get("Error Type") or "Error"] += 1
+        cache = result_row.get("Cache")
+        if isinstance(cache, str) and cache:
+            self.cache[cache] += 1
+        self.starts.append(_number(result_row.get("Started At")))
+        self.latencies.append(_number(result_row.get("Latency (ms)")))
+        self.ttfbs.append(_number(result_row.get("TTFB (ms)")))
+        self.failed.append(klass in FAILED_CLASSES)
+        self.hits.append(cache == CACHE_HIT)
+        self.request_bytes += _count(result_row.get("Request Size (B)"))
+        self.response_bytes += _count(result_row.get("Response Size (B)"))
+
+    def add_frame(self, frame):
+        for result_row in frame.to_dict('records'):
+            self.add(result_row)
+
+    def report(self):
+        rows = len(self.latencies)
+        report = {
+            "rows": rows,
+            "status_classes": dict(sorted(self.status_classes.items())),
+            "error_types": dict(self.error_types.most_common()),
+            "cache": dict(self.cache), "cache_hits": self.cache.get(CACHE_HIT, 0),
+            "error_rate": 0.0, "throughput_rps": None, "duration_s": None,
+            "latency_ms": {}, "ttfb_ms": {},
+            "request_bytes": self.request_bytes, "response_bytes": self.response_bytes,
+            "histogram": [], "timeline": [],
+        }
+        if not rows:
+            return report
+        failed = np.frombuffer(self.failed, dtype=np.int8).astype(bool)
+        hits = np.frombuffer(self.hits, dtype=np.int8).astype(bool)
+        report["error_rate"] = float(failed.mean())
+        latencies = np.frombuffer(self.latencies)
+        starts = np.frombuffer(self.starts)
+        # Cache hits still count towards throughput, not towards latency.
+        sent_latencies = np.where(hits, np.nan, latencies)
+        for key, values in (("latency_ms", sent_latencies), ("ttfb_ms", np.where(hits, np.nan, np.frombuffer(self.ttfbs)))):
+            values = values[~np.isnan(values)]
+            if len(values):
+                p50, p90, p99 = np.percentile(values, [50, 90, 99])
+                report[key] = {"p50": float(p50), "p90": float(p90), "p99": float(p99),
+                               "max": float(values.max()), "mean": float(values.mean())}
+        timed = ~np.isnan(starts) & ~np.isnan(latencies)
+        if timed.any():
+            begin = starts[timed].min()
+            finished = starts[timed] + latencies[timed] / 1000
+            duration = max(float(finished.max() - begin), 1e-9)
+            report["duration_s"] = duration
+            report["throughput_rps"] = int(timed.sum()) / duration
+            report["timeline"] = self._timeline(starts[timed] - begin, sent_latencies[timed], failed[timed], duration)
+        measured = sent_latencies[~np.isnan(sent_latencies)]
+        edges = [0] + LATENCY_BUCKETS_MS + [math.inf]
+        counts, _ = np.histogram(measured, bins=edges)
+        report["histogram"] = [
+            {"bucket": f"≤{edges[i + 1]:g} ms" if edges[i + 1] != math.inf else f">{edges[i]:g} ms", "requests": int(count)}
+            for i, count in enumerate(counts)
+        ]
+        return report
+
+    def _timeline(self, offsets, latencies, failed, duration):
+        width = max(1.0, math.ceil(duration / MAX_TIMELINE_BUCKETS))
+        frame = pd.DataFrame({
+            "second": (offsets // width) * width,
+            "latency": latencies,
+            "failed": failed,
+        })
+        grouped = frame.groupby("second")
+        timeline = pd.DataFrame({
+            "requests_per_s": grouped.size() / width,
+            "errors_per_s": grouped["failed"].sum() / width,
+            "p50_ms": grouped["latency"].median(),
+            "p90_ms": grouped["latency"].quantile(0.9),
+            "max_ms": grouped["latency"].max(),
+        }).reset_index()
+        return timeline.to_dict('records')
+
+def latency_bucket(latency):
+    if latency <= HISTOGRAM_MIN_MS:
+        return 0
+    return min(HISTOGRAM_SIZE - 1, math.ceil(math.log(latency / HISTOGRAM_MIN_MS) / math.log(HISTOGRAM_GROWTH)))
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        if math.isnan(latency):
+            return
+        self.counts[latency_bucket(latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantiles(self, qs):
+        # Each bucket reports its upper edge, capped at the largest latency
+        # seen so a single sample comes back exact.
+        indices = sorted(self.counts)
+        cumulative = np.cumsum([self.counts[i] for i in indices])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * self.count)
+        return [min(self.max, HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH ** indices[p]) for p in positions]
+
+class StreamingStats:
+    # Builds the same report as BatchStats in fixed memory, for runs whose
+    # length is set by a clock instead of a file. Latencies go into log
+    # buckets, and the timeline folds into wider slots as the run goes on.
+    def __init__(self):
+        self.status_classes = Counter()
+        self.error_types = Counter()
+        self.cache = Counter()
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.rows = 0
+        self.failed = 0
+        self.latency = LatencyHistogram()
+        self.ttfb = LatencyHistogram()
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.origin = None
+        self.begin = None
+        self.end = None
+        self.width = 1
+        self.slots = {}
+
+    def add(self, result_row):
+        klass = status_class(result_row.get("Status Code"))
+        self.status_classes[klass] += 1
+        if klass == SKIPPED:
+            return
+        if klass == "ERROR":
+            self.error_types[result_row.get("Error Type") or "Error"] += 1
+        cache = result_row.get("Cache")
+        if isinstance(cache, str) and cache:
+            self.cache[cache] += 1
+        failed = klass in FAILED_CLASSES
+        latency = _number(result_row.get("Latency (ms)"))
+        self.rows += 1
+        self.failed += failed
+        self.request_bytes += _count(result_row.get("Request Size (B)"))
+        self.response_bytes += _count(result_row.get("Response Size (B)"))
+        if math.isnan(latency):
+            return
+        sent = cache != CACHE_HIT
+        if sent:
+            self.latency.add(latency)
+            self.ttfb.add(_number(result_row.get("TTFB (ms)")))
+            self.buckets[next((i for i, edge in enumerate(LATENCY_BUCKETS_MS) if latency <= edge), len(LATENCY_BUCKETS_MS))] += 1
+        started = _number(result_row.get("Started At"))
+        if math.isnan(started):
+            return
+        if self.begin is None:
+            # Slots count from the first row seen; one that started a little
+            # earlier but finished later lands in the first slot.
+            self.origin = self.begin = self.end = started
+        self.begin = min(self.begin, started)
+        self.end = max(self.end, started + latency / 1000)
+        slot = self.slots.setdefault(max(0, int((started - self.origin) // self.width)), [0, 0, LatencyHistogram()])
+        slot[0] += 1
+        slot[1] += failed
+        if sent:
+            slot[2].add(latency)
+        if len(self.slots) > MAX_TIMELINE_BUCKETS:
+            self._fold()
+
+    def _fold(self):
+        self.width *= 2
+        slots = {}
+        for key, (count, failed, histogram) in self.slots.items():
+            merged = slots.setdefault(key // 2, [0, 0, LatencyHistogram()])
+            merged[0] += count
+            merged[1] += failed
+            merged[2].merge(histogram)
+        self.slots = slots
+
+    def report(self):
+        report = {
+            "rows": self.rows,
+            "status_classes": dict(sorted(self.status_classes.items())),
+            "error_types": dict(self.error_types.most_common()),
+            "cache": dict(self.cache), "cache_hits": self.cache.get(CACHE_HIT, 0),
+            "error_rate": 0.0, "throughput_rps": None, "duration_s": None,
+            "latency_ms": {}, "ttfb_ms": {},
+            "request_bytes": self.request_bytes, "response_bytes": self.response_bytes,
+            "histogram": [], "timeline": [],
+        }
+        if not self.rows:
+            return report
+        report["error_rate"] = self.failed / self.rows
+        for key, histogram in (("latency_ms", self.latency), ("ttfb_ms", self.ttfb)):
+            if histogram.count:
+                p50, p90, p99 = histogram.quantiles([0.5, 0.9, 0.99])
+                report[key] = {"p50": p50, "p90": p90, "p99": p99,
+                               "max": histogram.max, "mean": histogram.total / histogram.count}
+        if self.slots:
+            duration = max(self.end - self.begin, 1e-9)
+            report["duration_s"] = duration
+            report["throughput_rps"] = sum(slot[0] for slot in self.slots.values()) / duration
+            report["timeline"] = []
+            for key, (count, failed, histogram) in sorted(self.slots.items()):
+                p50, p90 = histogram.quantiles([0.5, 0.9]) if histogram.count else (None, None)
+                report["timeline"].append({
+                    "second": float(key * self.width), "requests_per_s": count / self.width, "errors_per_s": failed / self.width,
+                    "p50_ms": p50, "p90_ms": p90, "max_ms": histogram.max if histogram.count else None,
+                })
+        edges = [0] + LATENCY_BUCKETS_MS + [math.inf]
+        report["histogram"] = [
+            {"bucket": f"≤{edges[i + 1]:g} ms" if edges[i + 1] != math.inf else f">{edges[i]:g} ms", "requests": count}
+            for i, count in enumerate(self.buckets)
+        ]
+        return report
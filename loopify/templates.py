@@ -0,0 +1,159 @@
+import itertools
+import json
+import os
+import re
+import pandas as pd
+
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_][\w.-]*)\s*\}\}")
+TEMPLATE_FIELDS = ["method", "url", "headers", "payload_type", "payload"]
+DATA_SOURCES = {
+    "range": "Number range",
+    "values": "List of values",
+    "csv": "CSV file (one request per row)",
+}
+DEFAULT_VARIABLE = "value"
+CSV_CHUNK_ROWS = 10000
+
+def find_placeholders(value):
+    if isinstance(value, str):
+        return set(PLACEHOLDER.findall(value))
+    if isinstance(value, dict):
+        return set().union(*(find_placeholders(k) | find_placeholders(v) for k, v in value.items()))
+    if isinstance(value, list):
+        return set().union(*(find_placeholders(v) for v in value))
+    return set()
+
+def render_value(value, variables):
+    # A string that is only a placeholder takes the variable as it is, so
+    # {"id": "{{n}}"} sends a number when n comes from a range.
+    if isinstance(value, str):
+        whole = PLACEHOLDER.fullmatch(value)
+        if whole:
+            return variables[whole.group(1)]
+        return PLACEHOLDER.sub(lambda m: str(variables[m.group(1)]), value)
+    if isinstance(value, dict):
+        return {render_value(k, variables): render_value(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render_value(v, variables) for v in value]
+    return value
+
+def render_headers(headers, variables):
+    # Header names and values are always text, whatever the variable holds;
+    # raw types only matter inside payloads.
+    rendered = render_value(headers, variables)
+    if not isinstance(rendered, dict):
+        return rendered
+    return {_text(k): _text(v) for k, v in rendered.items()}
+
+def _text(value):
+    return value if isinstance(value, str) else json.dumps(value)
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if value is None:
+        return ''
+    return str(value)
+
+def _csv_path(data, base_dir):
+    path = data["csv"]
+    if base_dir and not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    if not os.path.exists(path):
+        raise ValueError(f"Template data file '{data['csv']}' does not exist.")
+    return path
+
+def template_variables(data, base_dir=None):
+    if "csv" in data:
+        return set(pd.read_csv(_csv_path(data, base_dir), nrows=0, dtype=str).columns)
+    return {data.get("name") or DEFAULT_VARIABLE}
+
+def iter_template_variables(data, base_dir=None):
+    if "range" in data:
+        bounds = data["range"]
+        name = data.get("name") or DEFAULT_VARIABLE
+        start, step = _range_bound(bounds, "start", 1), _range_bound(bounds, "step", 1)
+        # "end" is inclusive: 1 to 50000 means 50000 requests.
+        end = _range_bound(bounds, "end") + (1 if step > 0 else -1)
+        for number in range(start, end, step):
+            yield {name: number}
+    elif "values" in data:
+        name = data.get("name") or DEFAULT_VARIABLE
+        for value in data["values"]:
+            yield {name: value}
+    elif "csv" in data:
+        for chunk in pd.read_csv(_csv_path(data, base_dir), chunksize=CSV_CHUNK_ROWS, dtype=str, keep_default_na=False):
+            yield from chunk.to_dict('records')
+    else:
+        raise ValueError(f"Template data must be one of: {', '.join(DATA_SOURCES)}.")
+
+def _range_bound(bounds, field, default=None):
+    value = bounds.get(field, default)
+    if value is None:
+        raise ValueError(f"The range needs an '{field}' number.")
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"The range {field} must be a whole number, not {json.dumps(value)}.")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"The range {field} must be a whole number, not {json.dumps(value)}.")
+
+def check_data(data):
+    # The data source is read lazily, so its shape is checked up front
+    # instead of failing halfway into a run.
+    if "range" in data:
+        bounds = data["range"]
+        if not isinstance(bounds, dict):
+            raise ValueError("The template range must be an object with start, end and step.")
+        _range_bound(bounds, "start", 1)
+        _range_bound(bounds, "end")
+        if _range_bound(bounds, "step", 1) == 0:
+            raise ValueError("The range step can't be 0.")
+    elif "values" in data:
+        if not isinstance(data["values"], list):
+            raise ValueError("The template values must be a list.")
+    elif "csv" in data:
+        if not isinstance(data["csv"], str) or not data["csv"]:
+            raise ValueError("The template csv must be a file path.")
+    else:
+        raise ValueError(f"Template data must be one of: {', '.join(DATA_SOURCES)}.")
+    name = data.get("name")
+    if name is not None and not isinstance(name, str):
+        raise ValueError("The template variable name must be text.")
+
+def check_template(spec, base_dir=None):
+    if not isinstance(spec, dict) or not isinstance(spec.get("request"), dict) or not isinstance(spec.get("data"), dict):
+        raise ValueError("A template needs a 'request' object and a 'data' object.")
+    check_data(spec["data"])
+    request = spec["request"]
+    missing = [field for field in ("method", "url") if not request.get(field)]
+    if missing:
+        raise ValueError(f"The template request needs: {', '.join(missing)}.")
+    unknown = find_placeholders(request) - template_variables(spec["data"], base_dir)
+    if unknown:
+        raise ValueError(f"The template uses placeholders with no data: {', '.join(sorted(unknown))}.")
+
+def iter_template_chunks(spec, chunk_rows, base_dir=None):
+    # Rows are rendered one chunk at a time from the data source, so a sweep
+    # over 50k ids never exists as a whole table in memory or on disk.
+    check_template(spec, base_dir)
+    request = {field: spec["request"].get(field, '') for field in TEMPLATE_FIELDS}
+    request["payload_type"] = request["payload_type"] or "none"
+    variables = iter_template_variables(spec["data"], base_dir)
+    while True:
+        batch = list(itertools.islice(variables, chunk_rows))
+        if not batch:
+            return
+        rows = [[_cell((render_headers if field == "headers" else render_value)(request[field], values))
+                 for field in TEMPLATE_FIELDS] for values in batch]
+        yield pd.DataFrame(rows, columns=TEMPLATE_FIELDS)
+
+def template_size(spec):
+    data = spec.get("data", {})
+    if "range" in data:
+        bounds = data["range"]
+        start, step = _range_bound(bounds, "start", 1), _range_bound(bounds, "step", 1)
+        return max(0, (_range_bound(bounds, "end") - start) // step + 1)
+    if "values" in data:
+        return len(data["values"])
+    return None
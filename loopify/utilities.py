@@ -0,0 +1,556 @@
+import pandas as pd
+import json
+import time
+import shlex 
+import re
+import base64
+import os
+from urllib.parse import parse_qsl, urlencode
+from loopify.http_client import create_session, require_http2
+from loopify.rate_limit import create_rate_limiter
+from loopify.retries import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from loopify.stats import BatchStats
+from loopify.capture import BodyCapture, discard_body
+from loopify.cache import fill_from_cache, revalidation_headers
+from loopify.compression import check_encoding, encode_spec
+from loopify.hooks import HookSet, response_event, report_row_error
+from loopify.dispatch import Dispatcher
+from loopify.batch_io import (
+    iter_batch_chunks, open_binary, stream_size,
+    create_result_sink, new_run_dir, results_path,
+    CheckpointJournal, load_checkpoint, truncate_results, iter_result_chunks
+)
+
+IN_FLIGHT_PER_WORKER = 4
+BATCH_METHODS = {'GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS'}
+BODY_METHODS = {'POST', 'PUT', 'PATCH'}
+PAYLOAD_TYPES = {'json', 'form', 'text', 'none', ''}
+EMPTY_HEADERS = {}
+MAX_REPORTED_ERRORS = 50
+DEFAULT_CAPTURE = BodyCapture()
+
+def load_font(font_path, font_name):
+    with open(font_path, "rb") as f:
+        font_data = f.read()
+    font_base64 = base64.b64encode(font_data).decode('utf-8')
+    css = f"""
+    @font-face {{
+        font-family: '{font_name}';
+        src: url(data:font/ttf;base64,{font_base64}) format('truetype');
+    }}
+    """
+    return css
+
+def load_svg(svg_path):
+    with open(svg_path, "rb") as f:
+        svg_data = f.read()
+    svg_base64 = base64.b64encode(svg_data).decode('utf-8')
+    return f"data:image/svg+xml;base64,{svg_base64}"
+
+def parse_curl_command(curl_string):
+    try:
+        processed_string = re.sub(r'\\(\s*)\n', ' ', curl_string)
+        tokens = shlex.split(processed_string)
+    except ValueError as e:
+        raise Exception(f"Invalid cURL syntax: {e}")
+
+    url = ""
+    method = "GET"
+    headers = {}
+    data_parts = []
+    
+    it = iter(tokens)
+    for token in it:
+        if token == 'curl':
+            continue
+        if token.startswith('http://') or token.startswith('https://'):
+            url = token
+            continue
+        if token in ['-X', '--request']:
+            try:
+                method = next(it).upper()
+            except StopIteration:
+                raise Exception(f"Missing value for {token}")
+            continue
+        if token in ['-H', '--header']:
+            try:
+                header_str = next(it)
+                if ':' in header_str:
+                    k, v = header_str.split(':', 1)
+                    headers[k.strip()] = v.strip()
+            except (StopIteration, ValueError):
+                raise Exception(f"Invalid header format: {header_str}")
+            continue
+        if token in ['-d', '--data', '--data-raw', '--data-binary']:
+            try:
+                data_parts.append(next(it))
+                if method == "GET": method = "POST"
+            except StopIteration:
+                raise Exception(f"Missing value for {token}")
+            continue
+        if not url and not token.startswith('-'):
+            url = token
+    data = None
+    payload_type = "None"
+    if data_parts:
+        lower_headers = {k.lower(): v for k, v in headers.items()}
+        content_type = lower_headers.get('content-type', '')
+        if len(data_parts) > 1 or 'application/x-www-form-urlencoded' in content_type:
+            payload_type = "Form-Data"
+            form_string = "&".join(data_parts)
+            data = dict(parse_qsl(form_string))
+        else:
+            data_string = data_parts[0]
+            if 'application/json' in content_type or (not content_type and data_string.startswith('{') and data_string.endswith('}')):
+                payload_type = "JSON"
+                data = data_string
+                if 'content-type' not in lower_headers:
+                    headers['Content-Type'] = 'application/json'
+            else:
+                payload_type = "Text"
+                data = data_string
+    return url, method, headers, data, payload_type
+
+def format_headers(header_df):
+    headers = {}
+    for _, row in header_df.iterrows():
+        key = row["Header"]
+        value = row["Value"]
+        if key:
+            headers[key] = value
+    return headers
+
+def format_form_data(form_df):
+    form_data = {}
+    for _, row in form_df.iterrows():
+        key = row["Key"]
+        value = row["Value"]
+        if key:
+            form_data[key] = value
+    return form_data
+
+def _parse_json_cells(values):
+    # Batch files repeat the same headers and payloads across many rows,
+    # so each distinct string is decoded once and mapped back.
+    parsed = {}
+    for value in pd.unique(values):
+        try:
+            parsed[value] = json.loads(value)
+        except json.JSONDecodeError as e:
+            parsed[value] = e
+    return values.map(parsed)
+
+def _has_header(headers, name):
+    return any(k.lower() == name for k in headers)
+
+def prepare_batch_chunk(chunk):
+    methods = chunk['method'].str.strip().str.upper()
+    urls = chunk['url'].str.strip()
+    payload_types = chunk['payload_type'].str.strip().str.lower()
+    payloads = chunk['payload']
+    errors = []
+
+    def flag(mask, message):
+        for pos, value in zip(chunk.index[mask], chunk.loc[mask, message[0]]):
+            errors.append((pos, message[1].format(value=value)))
+
+    flag(~methods.isin(BATCH_METHODS), ('method', "Unsupported method '{value}'."))
+    flag(~urls.str.match(r'(?i)https?://\S'), ('url', "URL '{value}' must start with http:// or https://."))
+    flag(~payload_types.isin(PAYLOAD_TYPES), ('payload_type', "Unknown payload_type '{value}' (use json, form, text or none)."))
+
+    header_cells = chunk['headers'].str.strip()
+    has_headers = header_cells != ''
+    headers = pd.Series([EMPTY_HEADERS] * len(chunk), index=chunk.index, dtype=object)
+    if has_headers.any():
+        headers[has_headers] = _parse_json_cells(header_cells[has_headers])
+    bad_headers = headers.map(lambda h: not isinstance(h, dict))
+    flag(bad_headers, ('headers', "Invalid JSON in headers. Using empty headers."))
+    headers[bad_headers] = [EMPTY_HEADERS] * int(bad_headers.sum())
+    # requests rejects anything but text in a header value, so numbers and
+    # the like are sent as their JSON text instead of failing the row.
+    for pos, header in headers[has_headers & ~bad_headers].items():
+        loose = {name: value for name, value in header.items() if not isinstance(value, str)}
+        if loose:
+            for name, value in loose.items():
+                errors.append((pos, f"Header '{name}' is not a string. Sending it as {json.dumps(value)}."))
+            headers[pos] = {**header, **{name: json.dumps(value) for name, value in loose.items()}}
+
+    sends_body = methods.isin(BODY_METHODS) & (payloads != '')
+    decoded = pd.Series(None, index=chunk.index, dtype=object)
+    decode_rows = sends_body & payload_types.isin(['json', 'form'])
+    if decode_rows.any():
+        decoded[decode_rows] = _parse_json_cells(payloads[decode_rows])
+    bad_json = sends_body & payload_types.eq('json') & decoded.map(lambda v: isinstance(v, json.JSONDecodeError))
+    bad_form = sends_body & payload_types.eq('form') & decoded.map(lambda v: not isinstance(v, dict))
+    flag(bad_json, ('payload', "Invalid JSON in payload. Sending as raw text."))
+    flag(bad_form, ('payload', "Invalid JSON for form data. Skipping payload."))
+
+    specs = []
+    for pos, method, url, payload_type, header, payload, body, form in zip(
+        chunk.index, methods, urls, payload_types, headers, payloads, sends_body, decoded
+    ):
+        kwargs = {}
+        if body:
+            if payload_type == 'json':
+                # Valid JSON is sent as written instead of being decoded
+                # and re-encoded by requests on every send.
+                kwargs['data'] = payload.encode('utf-8')
+                if not isinstance(form, json.JSONDecodeError) and not _has_header(header, 'content-type'):
+                    header = {**header, 'Content-Type': 'application/json'}
+            elif payload_type == 'form' and isinstance(form, dict):
+                kwargs['data'] = urlencode(form, doseq=True).encode('utf-8')
+                if not _has_header(header, 'content-type'):
+                    header = {**header, 'Content-Type': 'application/x-www-form-urlencoded'}
+            elif payload_type == 'text':
+                kwargs['data'] = payload.encode('utf-8')
+                if not _has_header(header, 'content-type'):
+                    header = {**header, 'Content-Type': 'text/plain'}
+        specs.append((pos, method, url, header, kwargs))
+    return specs, sorted(errors)
+
+def format_validation_errors(errors, error_count, rows):
+    lines = [f"Found {error_count} problems in {rows} rows:"]
+    lines += [f"- Row {pos+1}: {message}" for pos, message in errors]
+    if error_count > len(errors):
+        lines.append(f"- ...and {error_count - len(errors)} more.")
+    return "\n".join(lines)
+
+def validate_batch(source, file_type):
+    stream, owned = open_binary(source)
+    errors = []
+    error_count = 0
+    rows = 0
+    try:
+        start = stream.tell()
+        for chunk in iter_batch_chunks(stream, file_type):
+            _, chunk_errors = prepare_batch_chunk(chunk)
+            error_count += len(chunk_errors)
+            errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+            rows += len(chunk)
+        stream.seek(start)
+    finally:
+        if owned:
+            stream.close()
+    return {"rows": rows, "errors": sorted(errors), "error_count": error_count}
+
+def notify(on_message, level, text):
+    if on_message:
+        on_message(level, text)
+
+def send_batch_request(session, spec, attempt=1, limiter=None, retry_policy=None, timeout=None, capture=None,
+                       cache=None, hooks=None):
+    # Sends one attempt and returns (result_row, retry_in). Backoff waits are
+    # left to the caller so a row waiting to retry never holds a worker.
+    capture = capture or DEFAULT_CAPTURE
+    _, method, url, headers, kwargs = spec
+    result_row = new_result_row(spec)
+    key = cache.key(method, url, headers, kwargs.get('data'), capture) if cache else None
+    if key is None:
+        result_row, retry_in, _ = send_attempt(session, spec, headers, result_row, attempt, limiter, retry_policy, timeout, capture, hooks)
+        if hooks:
+            hooks.emit("after_response", response_event(result_row, attempt, retry_in))
+        return result_row, retry_in
+    started = time.perf_counter()
+    entry, outcome = cache.claim(key)
+    if outcome != "lead":
+        fill_from_cache(result_row, entry, outcome)
+        result_row["Latency (ms)"] = round((time.perf_counter() - started) * 1000, 3)
+        if hooks:
+            hooks.emit("after_response", response_event(result_row, attempt, None, sent=False))
+        return result_row, None
+    stored = None
+    try:
+        result_row, retry_in, response = send_attempt(
+            session, spec, {**headers, **revalidation_headers(entry)}, result_row,
+            attempt, limiter, retry_policy, timeout, capture, hooks,
+        )
+        if response is not None and retry_in is None:
+            if entry is not None and response.status_code == 304:
+                stored = cache.refreshed(entry, response.headers)
+                fill_from_cache(result_row, stored, "revalidated")
+            else:
+                stored = cache.new_entry(result_row, response.headers)
+                result_row["Cache"] = "miss"
+    finally:
+        cache.release(key, stored)
+    if hooks:
+        hooks.emit("after_response", response_event(result_row, attempt, retry_in))
+    return result_row, retry_in
+
+def new_result_row(spec):
+    i, method, url, _, kwargs = spec
+    return {
+        "Request #": i + 1, "Method": method, "URL": url,
+        "Status Code": "N/A", "Response Body": "N/A", "Error": "N/A",
+        "Request Size (B)": len(kwargs.get('data') or b''),
+    }
+
+def send_attempt(session, spec, headers, result_row, attempt, limiter, retry_policy, timeout, capture, hooks=None):
+    # Returns (result_row, retry_in, response); the response is closed but
+    # its headers are still there for the cache and workflow extractors.
+    _, method, url, _, kwargs = spec
+    response = None
+    retry_in = None
+    if limiter:
+        limiter.acquire(url)
+    if hooks:
+        event = {
+            "row": result_row["Request #"], "attempt": attempt, "method": method, "url": url,
+            "headers": dict(headers), "request_bytes": result_row["Request Size (B)"], "sent_at": time.time(),
+        }
+        hooks.emit("before_send", event)
+        headers = event["headers"]
+    started = time.perf_counter()
+    try:
+        response = session.request(method=method, url=url, headers=headers, timeout=timeout, stream=True, **kwargs)
+        result_row["TTFB (ms)"] = round(response.elapsed.total_seconds() * 1000, 3)
+        result_row["Status Code"] = response.status_code
+        if limiter:
+            limiter.record(url, response.status_code, response.headers)
+        if retry_policy:
+            retry_in = retry_policy.retry_delay(attempt, method, status_code=response.status_code, headers=response.headers)
+        if retry_in is None:
+            body, size, truncated = capture.read(response)
+            result_row["Response Body"] = body
+            result_row["Body Truncated"] = truncated
+        else:
+            size = discard_body(response)
+        result_row["Latency (ms)"] = round((time.perf_counter() - started) * 1000, 3)
+        result_row["Response Size (B)"] = size
+    except Exception as e:
+        response = None
+        result_row["Latency (ms)"] = round((time.perf_counter() - started) * 1000, 3)
+        result_row["Status Code"] = "ERROR"
+        result_row["Error"] = str(e)
+        result_row["Error Type"] = type(e).__name__
+        if retry_policy:
+            retry_in = retry_policy.retry_delay(attempt, method, error=e)
+    return result_row, retry_in, response
+
+def summarize_results(path, output_format, as_stats=False):
+    stats = BatchStats()
+    if os.path.exists(path) and os.path.getsize(path):
+        for chunk in iter_result_chunks(path, output_format):
+            stats.add_frame(chunk)
+    return stats if as_stats else stats.report()
+
+def run_batch_requests(source, file_type, delay=0, concurrency=1, session=None,
+                       rps=None, burst=1, per_host_rps=None, adaptive=True,
+                       output_path=None, output_format="csv",
+                       checkpoint_path=None, resume=False, source_id=None,
+                       on_progress=None, on_message=None, cancel_event=None,
+                       validate=True, send_invalid=False,
+                       retry_policy=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                       capture=None, shard=None, cache=None,
+                       http2=False, compression="none", compress_responses=True, hooks=None):
+    if checkpoint_path and output_format == "parquet":
+        notify(on_message, "error", "Checkpointed runs need CSV or JSON Lines results; Parquet files can't be resumed.")
+        return None
+    if checkpoint_path and shard:
+        notify(on_message, "error", "Sharded runs can't be checkpointed.")
+        return None
+    try:
+        check_encoding(compression)
+        if http2 and session is None:
+            require_http2()
+    except (ValueError, ImportError) as e:
+        notify(on_message, "error", str(e))
+        return None
+    # A shard (index, count) sends only every count-th row starting at index,
+    # so several processes can split one file and still write in file order.
+    first_row, step = shard if shard else (0, 1)
+    state = None
+    if checkpoint_path and resume:
+        try:
+            state = load_checkpoint(checkpoint_path, source_id)
+        except ValueError as e:
+            notify(on_message, "error", f"Can't resume: {e}")
+            return None
+    if output_path is None:
+        output_path = results_path(new_run_dir(), output_format)
+    if state and state["complete"]:
+        notify(on_message, "info", "This batch already finished; showing its saved results.")
+        return {"output_path": output_path, "output_format": output_format,
+                "rows": state["flushed"], "errors": state["errors"], "resumed": state["flushed"],
+                "cancelled": False, "report": summarize_results(output_path, output_format)}
+    stream, owned = open_binary(source)
+    size = stream_size(stream)
+    total = None
+    if validate:
+        # One pass over the whole file before anything is sent, so a bad
+        # file fails with every problem listed instead of halfway through.
+        try:
+            report = validate_batch(stream, file_type)
+        except Exception as e:
+            if owned:
+                stream.close()
+            notify(on_message, "error", f"Error parsing file: {e}")
+            return None
+        total = len(range(first_row, report["rows"], step))
+        if report["error_count"]:
+            message = format_validation_errors(report["errors"], report["error_count"], total)
+            if not send_invalid:
+                if owned:
+                    stream.close()
+                notify(on_message, "error", message)
+                return None
+            notify(on_message, "warning", message)
+    truncate_results(output_path, state["offset"] if state else 0)
+    stats = summarize_results(output_path, output_format, as_stats=True) if state else BatchStats()
+    concurrency = max(1, int(concurrency))
+    max_in_flight = concurrency * IN_FLIGHT_PER_WORKER
+    limiter = create_rate_limiter(delay, rps, burst, per_host_rps, adaptive)
+    sink = create_result_sink(output_path, output_format)
+    journal = None
+    if checkpoint_path:
+        journal = CheckpointJournal(checkpoint_path, source_id, fresh=state is None, recorded=state["ready"] if state else ())
+        if state is None:
+            journal.record_flushed(0, sink.tell(), 0, {})
+    own_session = session is None
+    if own_session:
+        session = create_session(per_host=concurrency, http2=http2)
+    timeout = (connect_timeout, read_timeout)
+    encode = compression != "none" or not compress_responses
+    hooks = HookSet(hooks, on_message) if hooks else None
+    ready = dict(state["ready"]) if state else {}
+    next_to_write = state["flushed"] if state else first_row
+    errors = state["errors"] if state else 0
+    resumed = state["flushed"] + len(ready) if state else 0
+    submitted = 0
+    parse_error = None
+
+    def write_ready():
+        nonlocal next_to_write, errors
+        # Results finish out of order; hold them only until every earlier
+        # row is in, then append them to the sink in file order.
+        while next_to_write in ready:
+            result_row = ready.pop(next_to_write)
+            if result_row["Status Code"] == "ERROR":
+                errors += 1
+            stats.add(result_row)
+            sink.write(result_row)
+            next_to_write += step
+        sink.flush()
+        if journal:
+            journal.record_flushed(next_to_write, sink.tell(), errors, ready)
+
+    def send(spec, context, attempt):
+        return send_batch_request(session, spec, attempt, limiter, retry_policy, timeout, capture, cache, hooks)
+
+    def submit(spec):
+        nonlocal submitted
+        dispatcher.submit(spec)
+        submitted += 1
+
+    def finish(spec, attempt, first_started, result_row):
+        elapsed = time.monotonic() - first_started
+        result_row["Attempts"] = attempt
+        result_row["Elapsed (s)"] = round(elapsed, 3)
+        result_row["Started At"] = round(time.time() - elapsed, 3)
+        ready[spec[0]] = result_row
+        report_row_error(hooks, result_row)
+
+    def report_progress():
+        if not on_progress:
+            return
+        completed = submitted - len(dispatcher)
+        if total:
+            fraction = (completed + resumed) / total
+            text = f"{completed + resumed} of {total} rows complete."
+        else:
+            fraction = min(1.0, stream.tell() / size) if size else 1.0
+            if parse_error is None and fraction < 1.0:
+                text = f"{completed} of {submitted} requests complete ({fraction:.0%} of file read)."
+            else:
+                fraction = 1.0
+                text = f"{completed} of {submitted} requests complete."
+            fraction *= completed / max(submitted, 1)
+        if resumed:
+            text += f" {resumed} rows restored from checkpoint."
+        on_progress(completed, submitted, fraction, text)
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def wait_for_progress():
+        nonlocal submitted
+        if cancelled():
+            # Rows still queued behind the workers were never sent; drop them
+            # so cancelling only waits for the requests actually in flight.
+            # A retry that never went out ends with the attempt before it.
+            dropped = dispatcher.drop_queued()
+            for spec, _, attempt, first_started, last_result in dropped:
+                if last_result is None:
+                    submitted -= 1
+                else:
+                    finish(spec, attempt, first_started, last_result)
+            if dropped:
+                write_ready()
+        finished = dispatcher.wait(retry=not cancelled())
+        for spec, _, attempt, first_started, (result_row, _) in finished:
+            finish(spec, attempt, first_started, result_row)
+        if finished:
+            write_ready()
+            report_progress()
+
+    try:
+        write_ready()
+        with Dispatcher(send, concurrency, hooks) as dispatcher:
+            try:
+                # Rows are parsed a chunk at a time and handed to the pool as
+                # they arrive, so sending starts before the file is fully read
+                # and only a bounded window of rows is ever held in memory.
+                for chunk in iter_batch_chunks(stream, file_type):
+                    chunk = chunk[(chunk.index >= next_to_write) & ~chunk.index.isin(list(ready))]
+                    if step > 1:
+                        chunk = chunk[chunk.index % step == first_row]
+                    if not len(chunk):
+                        continue
+                    if cancelled():
+                        break
+                    specs, chunk_errors = prepare_batch_chunk(chunk)
+                    if encode:
+                        specs = [encode_spec(spec, compression, compress_responses) for spec in specs]
+                    if chunk_errors and not validate:
+                        notify(on_message, "warning", format_validation_errors(
+                            chunk_errors[:MAX_REPORTED_ERRORS], len(chunk_errors), len(chunk)))
+                    for spec in specs:
+                        if cancelled():
+                            break
+                        while dispatcher and len(dispatcher) + len(ready) >= max_in_flight:
+                            wait_for_progress()
+                        submit(spec)
+            except Exception as e:
+                parse_error = e
+            while dispatcher:
+                wait_for_progress()
+        was_cancelled = cancelled()
+        if journal and parse_error is None and not was_cancelled:
+            journal.mark_complete()
+    finally:
+        sink.close()
+        if journal:
+            journal.close()
+        if own_session:
+            session.close()
+        if owned:
+            stream.close()
+    summary = {
+        "output_path": output_path, "output_format": output_format,
+        "rows": (next_to_write - first_row) // step, "errors": errors, "resumed": resumed,
+        "cancelled": was_cancelled, "report": stats.report(),
+    }
+    if hooks:
+        hooks.emit("batch_finished", summary)
+    if parse_error is not None:
+        notify(on_message, "error", f"Error parsing file: {parse_error}")
+        if not submitted and not resumed:
+            return None
+        notify(on_message, "warning", f"Stopped reading the file after row {next_to_write}; the results cover the rows sent before the error.")
+        return summary
+    if was_cancelled:
+        resumable = " It can be resumed later." if journal else ""
+        notify(on_message, "warning", f"Batch cancelled after {summary['rows']} rows.{resumable}")
+        return summary
+    notify(on_message, "success", "Batch complete!")
+    return summary
@@ -0,0 +1,478 @@
+import json
+import os
+import re
+import time
+from collections import Counter, deque
+from urllib.parse import urlencode
+from loopify.batch_io import open_binary, create_result_sink, new_run_dir, results_path, truncate_results
+from loopify.capture import BodyCapture
+from loopify.compression import check_encoding, encode_spec
+from loopify.dispatch import Dispatcher
+from loopify.hooks import HookSet, response_event, report_row_error
+from loopify.http_client import create_session, require_http2
+from loopify.rate_limit import create_rate_limiter
+from loopify.retries import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from loopify.stats import BatchStats, SKIPPED, FAILED_CLASSES, status_class
+from loopify.templates import find_placeholders, render_value, render_headers, check_data, template_variables, iter_template_variables, template_size
+from loopify.utilities import (
+    new_result_row, send_attempt, notify,
+    BATCH_METHODS, BODY_METHODS, PAYLOAD_TYPES, IN_FLIGHT_PER_WORKER, DEFAULT_CAPTURE
+)
+
+NAME = re.compile(r"^[A-Za-z_][\w-]*$")
+URL_START = re.compile(r"(?i)https?://\S")
+JSONPATH_PART = re.compile(r"\.([A-Za-z_][\w-]*)|(\.?\*|\[\*\])|\[(-?\d+)\]|\[(['\"])(.*?)\4\]")
+WILDCARD = object()
+HEADER_PREFIX = "header:"
+# A 4xx stops the steps that depend on it, since they would run on an
+# answer the flow didn't expect, but it isn't a failed request.
+STEP_FAILED_CLASSES = FAILED_CLASSES + ("4xx",)
+# Steps that pull values out of the body keep it whole, whatever the
+# capture mode, since the extractors need all of it.
+EXTRACT_CAPTURE = BodyCapture("full")
+CANCELLED = "Skipped: the run was cancelled."
+WORKFLOW_OUTCOMES = ("completed", "failed", "cancelled")
+
+def parse_jsonpath(path):
+    # The everyday subset: $.a.b, $['a b'], $.items[0], $.items[-1] and
+    # $.items[*].id. A path with a wildcard extracts a list.
+    if not path.startswith("$"):
+        raise ValueError(f"JSONPath '{path}' must start with $.")
+    parts = []
+    pos = 1
+    while pos < len(path):
+        match = JSONPATH_PART.match(path, pos)
+        if not match:
+            raise ValueError(f"Can't read JSONPath '{path}' from '{path[pos:]}'.")
+        field, wildcard, index, _, quoted = match.groups()
+        if field is not None:
+            parts.append(field)
+        elif wildcard is not None:
+            parts.append(WILDCARD)
+        elif index is not None:
+            parts.append(int(index))
+        else:
+            parts.append(quoted)
+        pos = match.end()
+    return parts
+
+def jsonpath_values(document, parts):
+    values = [document]
+    for part in parts:
+        found = []
+        for value in values:
+            if part is WILDCARD:
+                if isinstance(value, dict):
+                    found.extend(value.values())
+                elif isinstance(value, list):
+                    found.extend(value)
+            elif isinstance(part, int):
+                if isinstance(value, list) and -len(value) <= part < len(value):
+                    found.append(value[part])
+            elif isinstance(value, dict) and part in value:
+                found.append(value[part])
+        values = found
+    return values
+
+def compile_extractor(expression):
+    if not isinstance(expression, str):
+        raise ValueError(f"Extractor {expression!r} must be a string.")
+    if expression.lower().startswith(HEADER_PREFIX):
+        name = expression[len(HEADER_PREFIX):].strip()
+        if not name:
+            raise ValueError(f"Extractor '{expression}' needs a header name.")
+        return {"kind": "header", "name": name, "expression": expression}
+    if expression == "status":
+        return {"kind": "status", "expression": expression}
+    parts = parse_jsonpath(expression)
+    return {"kind": "json", "parts": parts, "many": WILDCARD in parts, "expression": expression}
+
+def extract_value(extractor, result_row, headers, document):
+    if extractor["kind"] == "status":
+        return result_row["Status Code"]
+    if extractor["kind"] == "header":
+        value = headers.get(extractor["name"]) if headers is not None else None
+        if value is None:
+            raise ValueError(f"no {extractor['name']} header")
+        return value
+    values = jsonpath_values(document(), extractor["parts"])
+    if extractor["many"]:
+        return values
+    if not values:
+        raise ValueError(f"{extractor['expression']} matched nothing")
+    return values[0]
+
+def _step_request(step):
+    headers = step.get("headers") or {}
+    if not isinstance(headers, dict):
+        raise ValueError(f"Step '{step['name']}' headers must be an object.")
+    payload_type = str(step.get("payload_type") or ("json" if step.get("payload") not in (None, "") else "none")).lower()
+    if payload_type not in PAYLOAD_TYPES:
+        raise ValueError(f"Step '{step['name']}' has an unknown payload_type '{payload_type}' (use json, form, text or none).")
+    return {"url": step.get("url"), "headers": headers, "payload": step.get("payload")}, payload_type
+
+def check_workflow(spec, base_dir=None):
+    # Returns the steps in file order, each with its dependencies resolved:
+    # the ones listed in depends_on plus every step whose extracted values
+    # it uses as {{step.value}}.
+    if not isinstance(spec, dict) or not isinstance(spec.get("steps"), list) or not spec["steps"]:
+        raise ValueError("A workflow needs a non-empty 'steps' list.")
+    data = spec.get("data")
+    if data is not None and not isinstance(data, dict):
+        raise ValueError("The workflow 'data' must be an object.")
+    if data:
+        check_data(data)
+    data_variables = template_variables(data, base_dir) if data else set()
+    steps = {}
+    for index, raw in enumerate(spec["steps"]):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Step {index + 1} must be an object.")
+        name = raw.get("name") or f"step{index + 1}"
+        if not NAME.match(name):
+            raise ValueError(f"Step name '{name}' may only use letters, digits, _ and -.")
+        if name in steps:
+            raise ValueError(f"Two steps are called '{name}'.")
+        method = str(raw.get("method") or "").strip().upper()
+        if method not in BATCH_METHODS:
+            raise ValueError(f"Step '{name}' has an unsupported method '{raw.get('method')}'.")
+        if not raw.get("url"):
+            raise ValueError(f"Step '{name}' needs a url.")
+        depends_on = raw.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        extract = raw.get("extract") or {}
+        if not isinstance(extract, dict):
+            raise ValueError(f"Step '{name}' extract must be an object of name: extractor.")
+        for variable in extract:
+            if not NAME.match(variable):
+                raise ValueError(f"Step '{name}' extracts into '{variable}'; use letters, digits, _ and -.")
+        request, payload_type = _step_request({**raw, "name": name})
+        try:
+            extractors = {variable: compile_extractor(expression) for variable, expression in extract.items()}
+        except ValueError as e:
+            raise ValueError(f"Step '{name}': {e}")
+        steps[name] = {
+            "name": name, "index": index, "method": method, "payload_type": payload_type, "request": request,
+            "depends_on": set(depends_on), "extract": extractors, "dependents": [],
+            "reads_body": any(extractor["kind"] == "json" for extractor in extractors.values()),
+        }
+    for step in steps.values():
+        for placeholder in find_placeholders(step["request"]):
+            if placeholder in data_variables:
+                continue
+            source, _, variable = placeholder.partition(".")
+            if source not in steps or not variable:
+                raise ValueError(f"Step '{step['name']}' uses {{{{{placeholder}}}}}, which is neither a data variable nor step.value.")
+            if variable not in steps[source]["extract"]:
+                raise ValueError(f"Step '{step['name']}' uses {{{{{placeholder}}}}} but step '{source}' doesn't extract '{variable}'.")
+            step["depends_on"].add(source)
+        unknown = step["depends_on"] - set(steps)
+        if unknown:
+            raise ValueError(f"Step '{step['name']}' depends on unknown steps: {', '.join(sorted(unknown))}.")
+        if step["name"] in step["depends_on"]:
+            raise ValueError(f"Step '{step['name']}' depends on itself.")
+        for dependency in step["depends_on"]:
+            steps[dependency]["dependents"].append(step)
+    # Kahn's algorithm; whatever is left over sits on a cycle.
+    waiting = {name: len(step["depends_on"]) for name, step in steps.items()}
+    queue = [name for name, count in waiting.items() if not count]
+    while queue:
+        for dependent in steps[queue.pop()]["dependents"]:
+            waiting[dependent["name"]] -= 1
+            if not waiting[dependent["name"]]:
+                queue.append(dependent["name"])
+    looped = sorted(name for name, count in waiting.items() if count)
+    if looped:
+        raise ValueError(f"These steps depend on each other in a loop: {', '.join(looped)}.")
+    return list(steps.values())
+
+def load_workflow(source):
+    stream, owned = open_binary(source)
+    try:
+        spec = json.load(stream)
+    finally:
+        if owned:
+            stream.close()
+    base_dir = os.path.dirname(os.fspath(source)) if isinstance(source, (str, os.PathLike)) else None
+    return spec, check_workflow(spec, base_dir), base_dir
+
+def render_step(position, step, variables):
+    request = render_value(step["request"], variables)
+    method = step["method"]
+    url = str(request["url"]).strip()
+    if not URL_START.match(url):
+        raise ValueError(f"URL '{url}' must start with http:// or https://.")
+    headers = render_headers(step["request"]["headers"], variables)
+    payload = request["payload"]
+    kwargs = {}
+    if method in BODY_METHODS and payload not in (None, ""):
+        payload_type = step["payload_type"]
+        if payload_type == "json":
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            content_type = "application/json"
+        elif payload_type == "form":
+            form = json.loads(payload) if isinstance(payload, str) else payload
+            if not isinstance(form, dict):
+                raise ValueError("Form payloads must be an object.")
+            data = urlencode(form, doseq=True)
+            content_type = "application/x-www-form-urlencoded"
+        else:
+            data = str(payload)
+            content_type = "text/plain"
+        kwargs["data"] = data.encode("utf-8")
+        if not any(k.lower() == "content-type" for k in headers):
+            headers["Content-Type"] = content_type
+    return position, method, url, headers, kwargs
+
+def send_step(session, spec, attempt, limiter, retry_policy, timeout, capture, hooks):
+    result_row, retry_in, response = send_attempt(
+        session, spec, spec[3], new_result_row(spec), attempt, limiter, retry_policy, timeout, capture, hooks,
+    )
+    if hooks:
+        hooks.emit("after_response", response_event(result_row, attempt, retry_in))
+    return result_row, retry_in, response
+
+def run_workflows(source, delay=0, concurrency=1, session=None,
+                  rps=None, burst=1, per_host_rps=None, adaptive=True,
+                  output_path=None, output_format="csv",
+                  on_progress=None, on_message=None, cancel_event=None,
+                  retry_policy=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                  capture=None, http2=False, compression="none", compress_responses=True, hooks=None):
+    # Runs every step of every workflow instance (one per data row) as soon
+    # as the steps it depends on have finished. Independent steps and
+    # instances share one pool, so only real dependencies wait on each other.
+    try:
+        check_encoding(compression)
+        if http2 and session is None:
+            require_http2()
+        spec, steps, base_dir = load_workflow(source)
+        data = spec.get("data")
+        expected = template_size(spec) if data else 1
+    except (ValueError, ImportError) as e:
+        notify(on_message, "error", f"Workflow problem: {e}")
+        return None
+    instances = iter_template_variables(data, base_dir) if data else iter([{}])
+    count = len(steps)
+    if output_path is None:
+        output_path = results_path(new_run_dir(), output_format)
+    concurrency = max(1, int(concurrency))
+    max_in_flight = concurrency * IN_FLIGHT_PER_WORKER
+    limiter = create_rate_limiter(delay, rps, burst, per_host_rps, adaptive)
+    truncate_results(output_path, 0)
+    sink = create_result_sink(output_path, output_format)
+    stats = BatchStats()
+    own_session = session is None
+    if own_session:
+        session = create_session(per_host=concurrency, http2=http2)
+    timeout = (connect_timeout, read_timeout)
+    capture = capture or DEFAULT_CAPTURE
+    encode = compression != "none" or not compress_responses
+    hooks = HookSet(hooks, on_message) if hooks else None
+    runnable = deque()
+    ready = {}
+    outcomes = Counter()
+    next_to_write = 0
+    errors = 0
+    started = 0
+    exhausted = False
+    parse_error = None
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def record(run, step, result_row):
+        position = run["index"] * count + step["index"]
+        result_row["Request #"] = position + 1
+        result_row["Workflow #"] = run["index"] + 1
+        result_row["Step"] = step["name"]
+        ready[position] = result_row
+        run["left"] -= 1
+        if not run["left"]:
+            outcomes["failed" if run["failed"] else "cancelled" if run["cancelled"] else "completed"] += 1
+
+    def skip_dependents(run, step, reason):
+        for dependent in step["dependents"]:
+            if run["waiting"].pop(dependent["name"], None) is not None:
+                record(run, dependent, {
+                    "Method": dependent["method"], "URL": dependent["request"]["url"],
+                    "Status Code": SKIPPED, "Response Body": "N/A", "Error": reason,
+                })
+                skip_dependents(run, dependent, reason)
+
+    def cancel(run, step):
+        run["cancelled"] = True
+        record(run, step, {"Method": step["method"], "URL": step["request"]["url"], "Status Code": SKIPPED,
+                           "Response Body": "N/A", "Error": CANCELLED})
+        skip_dependents(run, step, CANCELLED)
+
+    def fail(run, step, result_row):
+        run["failed"] = True
+        record(run, step, result_row)
+        skip_dependents(run, step, f"Skipped: step '{step['name']}' failed.")
+        report_row_error(hooks, result_row)
+
+    def make_runnable(run, step):
+        if cancelled():
+            cancel(run, step)
+            return
+        position = run["index"] * count + step["index"]
+        try:
+            spec = render_step(position, step, run["variables"])
+        except (ValueError, TypeError) as e:
+            fail(run, step, {"Method": step["method"], "URL": step["request"]["url"], "Status Code": "ERROR",
+                             "Response Body": "N/A", "Error": str(e), "Error Type": "WorkflowError"})
+            return
+        if encode:
+            spec = encode_spec(spec, compression, compress_responses)
+        runnable.append((run, step, spec))
+
+    def start_next():
+        nonlocal started, exhausted, parse_error
+        try:
+            values = next(instances)
+        except StopIteration:
+            exhausted = True
+            return
+        except Exception as e:
+            parse_error = e
+            exhausted = True
+            return
+        run = {
+            "index": started, "variables": dict(values), "left": count, "failed": False, "cancelled": False,
+            "waiting": {step["name"]: len(step["depends_on"]) for step in steps if step["depends_on"]},
+        }
+        started += 1
+        for step in steps:
+            if not step["depends_on"]:
+                make_runnable(run, step)
+
+    def send(spec, context, attempt):
+        step_capture = EXTRACT_CAPTURE if context[1]["reads_body"] else capture
+        return send_step(session, spec, attempt, limiter, retry_policy, timeout, step_capture, hooks)
+
+    def complete(run, step, attempt, first_started, result_row, response):
+        elapsed = time.monotonic() - first_started
+        result_row["Attempts"] = attempt
+        result_row["Elapsed (s)"] = round(elapsed, 3)
+        result_row["Started At"] = round(time.time() - elapsed, 3)
+        if status_class(result_row["Status Code"]) in STEP_FAILED_CLASSES:
+            fail(run, step, result_row)
+            return
+        parsed = []
+
+        def document():
+            # Parsed once, and only if a JSONPath extractor asks for it.
+            if not parsed:
+                try:
+                    parsed.append(json.loads(result_row["Response Body"]))
+                except (TypeError, json.JSONDecodeError):
+                    raise ValueError("the response body is not JSON")
+            return parsed[0]
+
+        headers = response.headers if response is not None else None
+        for variable, extractor in step["extract"].items():
+            try:
+                run["variables"][f"{step['name']}.{variable}"] = extract_value(extractor, result_row, headers, document)
+            except ValueError as e:
+                result_row["Error"] = f"Couldn't extract '{variable}': {e}."
+                result_row["Error Type"] = "ExtractError"
+                fail(run, step, result_row)
+                return
+        record(run, step, result_row)
+        for dependent in step["dependents"]:
+            name = dependent["name"]
+            if name in run["waiting"]:
+                run["waiting"][name] -= 1
+                if not run["waiting"][name]:
+                    del run["waiting"][name]
+                    make_runnable(run, dependent)
+
+    def write_ready():
+        nonlocal next_to_write, errors
+        # Rows go out in instance then step order, whatever order they
+        # finished in.
+        while next_to_write in ready:
+            result_row = ready.pop(next_to_write)
+            if result_row["Status Code"] == "ERROR":
+                errors += 1
+            stats.add(result_row)
+            sink.write(result_row)
+            next_to_write += 1
+        sink.flush()
+
+    def collect(finished):
+        for spec, (run, step), attempt, first_started, (result_row, _, response) in finished:
+            complete(run, step, attempt, first_started, result_row, response)
+        write_ready()
+        if on_progress:
+            finished = outcomes["completed"] + outcomes["failed"]
+            total = expected if expected is not None else started
+            on_progress(next_to_write, started * count, finished / total if total else 1.0,
+                        f"{finished} of {total if expected is not None else f'{started}+'} workflows finished "
+                        f"({outcomes['failed']} failed), {next_to_write} steps recorded.")
+
+    def drop_queued():
+        # Steps not yet on the wire are recorded as skipped so the results
+        # keep one row per step; a retry that never went out keeps the
+        # attempt before it.
+        for spec, (run, step), attempt, first_started, last_result in dispatcher.drop_queued():
+            if last_result is None:
+                cancel(run, step)
+            else:
+                complete(run, step, attempt, first_started, last_result, None)
+        while runnable:
+            run, step, _ = runnable.popleft()
+            cancel(run, step)
+
+    def wait_for_progress():
+        if dispatcher:
+            collect(dispatcher.wait(retry=not cancelled()))
+        else:
+            write_ready()
+
+    try:
+        with Dispatcher(send, concurrency, hooks) as dispatcher:
+            while True:
+                if cancelled():
+                    drop_queued()
+                while runnable and len(dispatcher) < max_in_flight:
+                    run, step, spec = runnable.popleft()
+                    dispatcher.submit(spec, (run, step))
+                busy = len(dispatcher)
+                # New instances start only when nothing already started is
+                # ready to go, so running flows finish before new ones pile up.
+                if not exhausted and not cancelled() and not runnable and busy + len(ready) < max_in_flight:
+                    start_next()
+                    continue
+                # Steps that fail before they are sent (a bad rendered URL)
+                # are recorded without ever being busy, so only stop once
+                # every instance has started; waiting drains what is ready.
+                if not busy and not runnable and (exhausted or cancelled()):
+                    break
+                wait_for_progress()
+        write_ready()
+        was_cancelled = cancelled()
+    finally:
+        sink.close()
+        if own_session:
+            session.close()
+    summary = {
+        "output_path": output_path, "output_format": output_format,
+        "rows": next_to_write, "errors": errors, "resumed": 0,
+        "cancelled": was_cancelled, "report": stats.report(),
+        "workflows": {"instances": started, "steps": count, **{outcome: outcomes[outcome] for outcome in WORKFLOW_OUTCOMES}},
+    }
+    if hooks:
+        hooks.emit("batch_finished", summary)
+    if parse_error is not None:
+        notify(on_message, "error", f"Error reading the workflow data: {parse_error}")
+        if not started:
+            return None
+        return summary
+    if was_cancelled:
+        notify(on_message, "warning", f"Workflows cancelled after {started} instances.")
+        return summary
+    if outcomes["failed"]:
+        notify(on_message, "warning", f"{outcomes['failed']} of {started} workflows had a failing step; their later steps were skipped.")
+    notify(on_message, "success", "Workflows complete!")
+    return summary
@@ -0,0 +1,34 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from loopify.capture import BodyCapture
+
+BODY = gzip.compress(b"0" * (3 * 1024 * 1024))
+
+class GzipHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize("capture", [BodyCapture("full"), BodyCapture("truncate", 10), BodyCapture("hash"), BodyCapture("none")])
+def test_size_counts_wire_bytes_whether_or_not_the_read_stops_early(url, capture):
+    with requests.Session() as session:
+        _, size, _ = capture.read(session.get(url, stream=True))
+    assert size == len(BODY)
@@ -0,0 +1,23 @@
+import pytest
+from loopify import loadtest
+from loopify.loadtest import run_load_test
+
+SCENARIO = "method,url,payload_type\nGET,http://127.0.0.1:9/,none\n"
+
+def test_more_users_than_the_pool_is_rejected(tmp_path):
+    source = tmp_path / "scenario.csv"
+    source.write_text(SCENARIO)
+    with pytest.raises(ValueError, match="at most 4 virtual users"):
+        run_load_test(str(source), "csv", users=5, max_in_flight=4, duration=1)
+
+def test_crashed_users_are_reported(tmp_path, monkeypatch):
+    def crash(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(loadtest, "send_batch_request", crash)
+    source = tmp_path / "scenario.csv"
+    source.write_text(SCENARIO)
+    messages = []
+    summary = run_load_test(str(source), "csv", users=3, duration=1,
+                            on_message=lambda level, text: messages.append((level, text)))
+    assert summary["load_test"]["crashed"] == 3
+    assert ("error", "3 virtual users stopped on an unexpected error: RuntimeError: boom") in messages
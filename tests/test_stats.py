@@ -0,0 +1,17 @@
+import pytest
+
+from loopify.stats import BatchStats, StreamingStats
+
+def _row(started, latency, cache=""):
+    return {"Status Code": 200, "Started At": started, "Latency (ms)": latency, "TTFB (ms)": latency, "Cache": cache}
+
+@pytest.mark.parametrize("stats_class", [BatchStats, StreamingStats])
+def test_cache_hits_stay_out_of_latency(stats_class):
+    stats = stats_class()
+    stats.add(_row(0.0, 100.0, "miss"))
+    for index in range(9):
+        stats.add(_row(0.1 * index, 0.01, "hit"))
+    report = stats.report()
+    assert report["rows"] == 10
+    assert report["cache_hits"] == 9
+    assert report["latency_ms"]["p50"] == pytest.approx(100.0, rel=0.02)
@@ -0,0 +1,22 @@
+import pytest
+from loopify.templates import check_template, template_size
+
+def template(data):
+    return {"request": {"method": "GET", "url": "http://127.0.0.1/{{value}}"}, "data": data}
+
+@pytest.mark.parametrize("data, message", [
+    ({"range": {"start": 1}}, "needs an 'end'"),
+    ({"range": 5}, "must be an object"),
+    ({"range": {"end": "x"}}, "whole number"),
+    ({"range": {"end": 1.5}}, "whole number"),
+    ({"range": {"end": 3, "step": 0}}, "can't be 0"),
+    ({"values": "a,b"}, "must be a list"),
+    ({"rows": []}, "must be one of"),
+])
+def test_bad_data_sources_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        check_template(template(data))
+
+def test_range_size_counts_the_inclusive_end():
+    assert template_size(template({"range": {"start": 10, "end": 1, "step": -3}})) == 4
+    assert template_size(template({"range": {"end": "50"}})) == 50
@@ -0,0 +1,57 @@
+import json
+from benchmarks.stub_server import StubServer
+from loopify.workflows import run_workflows
+
+def write_workflow(tmp_path, spec):
+    path = tmp_path / "flow.workflow.json"
+    path.write_text(json.dumps(spec))
+    return path
+
+def read_rows(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_unsendable_root_steps_keep_every_instance(tmp_path):
+    # The rendered URL "1" is not http(s), so every root step fails before it
+    # is sent. The run used to stop once the reorder window filled up.
+    source = write_workflow(tmp_path, {
+        "data": {"range": {"start": 1, "end": 50}, "name": "id"},
+        "steps": [
+            {"name": "root", "method": "GET", "url": "{{id}}"},
+            {"name": "next", "method": "GET", "url": "http://127.0.0.1:9/{{id}}", "depends_on": ["root"]},
+        ],
+    })
+    output = tmp_path / "results.jsonl"
+    summary = run_workflows(source, concurrency=1, output_path=str(output), output_format="jsonl")
+    rows = read_rows(output)
+    assert summary["workflows"]["instances"] == 50
+    assert summary["workflows"]["failed"] == 50
+    assert [row["Request #"] for row in rows] == list(range(1, 101))
+    assert {row["Step"]: row["Status Code"] for row in rows[:2]} == {"root": "ERROR", "next": "SKIPPED"}
+
+def test_every_step_is_recorded_in_order(tmp_path):
+    with StubServer() as server:
+        source = write_workflow(tmp_path, {
+            "data": {"range": {"start": 1, "end": 30}, "name": "id"},
+            "steps": [
+                {"name": "first", "method": "GET", "url": server.url + "/a/{{id}}", "extract": {"ok": "$.ok"}},
+                {"name": "second", "method": "POST", "url": server.url + "/b/{{id}}", "payload": {"ok": "{{first.ok}}"}},
+            ],
+        })
+        output = tmp_path / "results.jsonl"
+        summary = run_workflows(source, concurrency=4, output_path=str(output), output_format="jsonl")
+    rows = read_rows(output)
+    assert summary["workflows"]["completed"] == 30
+    assert [row["Request #"] for row in rows] == list(range(1, 61))
+    assert [row["Step"] for row in rows[:2]] == ["first", "second"]
+    assert all(row["Status Code"] == 200 for row in rows)
+
+def test_bad_data_source_is_a_workflow_problem(tmp_path):
+    source = write_workflow(tmp_path, {
+        "data": {"range": {"start": 1}},
+        "steps": [{"name": "root", "method": "GET", "url": "http://127.0.0.1:9/{{value}}"}],
+    })
+    messages = []
+    summary = run_workflows(source, output_path=str(tmp_path / "results.jsonl"), output_format="jsonl",
+                            on_message=lambda level, text: messages.append((level, text)))
+    assert summary is None
+    assert messages == [("error", "Workflow problem: The range needs an 'end' number.")]
@@ -1,13 +1,115 @@
 import streamlit as st
+import io
 import requests
 import pandas as pd
 import json
-from utilities import (
+from urllib.parse import urlencode
+from loopify.utilities import (
     load_font, load_svg, parse_curl_command, 
-    format_headers, format_form_data, run_batch_requests
+    format_headers, format_form_data
+)
+from loopify.http_client import create_session, get_pool_stats, DEFAULT_PER_HOST, diff_pool_stats, response_protocol, HTTP_VERSIONS
+from loopify.compression import REQUEST_ENCODINGS, encode_request
+from loopify.batch_io import (
+    detect_file_type, fingerprint_source, parse_body,
+    new_run_dir, results_path, checkpoint_path, load_checkpoint, save_upload, save_template_data
+)
+from loopify.jobs import JobManager
+from loopify.capture import BodyCapture, CAPTURE_MODES, DEFAULT_TRUNCATE_BYTES
+from loopify.cache import ResponseCache, DiskStore, CACHE_OUTCOMES, CACHE_PATH, DEFAULT_TTL
+from loopify.loadtest import run_load_test, MAX_IN_FLIGHT
+from loopify.templates import DATA_SOURCES, check_template, iter_template_chunks, template_size
+from loopify.sharding import run_sharded_batch, MAX_PROCESSES
+from loopify.workflows import run_workflows
+from loopify.metrics import MetricsExporter, METRICS_FORMATS
+from loopify.results_store import load_results_store, GROUP_BY
+from loopify.retries import (
+    RetryPolicy, parse_status_list, DEFAULT_RETRY_STATUSES, DEFAULT_RETRY_ERRORS,
+    RETRY_ERROR_TYPES, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
 )
 import os
 
+ASSETS_DIR = "assets"
+FONT_PATH = os.path.join(ASSETS_DIR, "BagelFatOne-Regular.ttf")
+SVG_PATH = os.path.join(ASSETS_DIR, "loopify.svg")
+FONT_NAME = "BagelFatOne Inline"
+TAB_LABELS = ["🔧 Single Request", "🚀 LOOPIFY PRO"]
+APP_CSS = """
+.custom-title {
+    display: flex;
+    color: #FFB300;
+    align-items: center;
+    gap: 12px;
+    padding-top: 20px;
+    padding-bottom: 20px;
+}
+.custom-title img {
+    height: 75px;
+    width: 75px;
+}
+.custom-title h1 {
+    align-items: center;
+    font-family: 'BagelFatOne Inline', sans-serif;
+    font-size: 3em;
+    font-weight: 600;
+    margin: 0;
+    padding: 0;
+}
+
+.bold-tab {
+    font-weight: 900 !important;
+    font-size: 1.2em !important;
+}
+.pro-tab {
+    font-weight: 900 !important;
+    font-size: 1.3em !important;
+    color: #FF6B00 !important;
+}
+
+.stTabs [data-baseweb="tab-list"] {
+    gap: 8px;
+}
+.stTabs [data-baseweb="tab"] {
+    height: 50px;
+    white-space: pre-wrap;
+    background-color: #F0F2F6;
+    border-radius: 4px 4px 0px 0px;
+    gap: 1px;
+    padding-top: 10px;
+    padding-bottom: 10px;
+    font-weight: 900;
+    font-size: 1.1em;
+}
+.stTabs [aria-selected="true"] {
+    background-color: #FFFFFF;
+    border-bottom: 3px solid #FF6B00;
+    font-weight: 900;
+    font-size: 1.2em;
+}
+"""
+RESULTS_PAGE_SIZE = 100
+JOB_POLL_INTERVAL = 1.0
+
+@st.cache_resource
+def get_http_session(http2=False, per_host=DEFAULT_PER_HOST):
+    return create_session(per_host=per_host, http2=http2)
+
+# Keyed on the file's size and mtime so a resumed run is loaded again.
+@st.cache_resource(max_entries=2, show_spinner="Loading results...")
+def get_results_store(path, output_format, size, mtime):
+    return load_results_store(path, output_format)
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
+
+def get_upload_id(uploaded_file, output_format):
+    upload_ids = st.session_state.setdefault("upload_ids", {})
+    key = (uploaded_file.file_id, output_format)
+    if key not in upload_ids:
+        upload_ids[key] = fingerprint_source(uploaded_file, extra=output_format)
+    return upload_ids[key]
+
 def initialize_session_state():
     if "headers" not in st.session_state:
         st.session_state.headers = pd.DataFrame([{"Header": "", "Value": ""}])
@@ -22,75 +124,18 @@ def initialize_session_state():
     if "payload_body" not in st.session_state:
         st.session_state.payload_body = ""
 
-def render_custom_title():
-    ASSETS_DIR = "assets"
-    FONT_PATH = os.path.join(ASSETS_DIR, "BagelFatOne-Regular.ttf")
-    SVG_PATH = os.path.join(ASSETS_DIR, "loopify.svg")
-    FONT_NAME = "BagelFatOne Inline"
+@st.cache_resource(show_spinner=False)
+def get_title_assets():
+    # The font and logo are a few MB once base64-encoded, so they are read
+    # and encoded once per process instead of on every rerun.
+    font_css = load_font(FONT_PATH, FONT_NAME)
+    svg_data_url = load_svg(SVG_PATH)
+    return f"<style>{font_css}{APP_CSS}</style>", svg_data_url
 
+def render_custom_title():
     try:
-        font_css = load_font(FONT_PATH, FONT_NAME)
-        svg_data_url = load_svg(SVG_PATH)
-        
-        # Apply the CSS styles
-        st.markdown(f"<style>{font_css}</style>", unsafe_allow_html=True)
-        
-        # Apply additional CSS for the custom title
-        st.markdown("""
-        <style>
-        .custom-title {
-            display: flex;
-            color: #FFB300;
-            align-items: center;
-            gap: 12px;
-            padding-top: 20px;
-            padding-bottom: 20px;
-        }
-        .custom-title img {
-            height: 75px;
-            width: 75px;
-        }
-        .custom-title h1 {
-            align-items: center;
-            font-family: 'BagelFatOne Inline', sans-serif;
-            font-size: 3em;
-            font-weight: 600;
-            margin: 0;
-            padding: 0;
-        }
-        
-        .bold-tab {
-            font-weight: 900 !important;
-            font-size: 1.2em !important;
-        }
-        .pro-tab {
-            font-weight: 900 !important;
-            font-size: 1.3em !important;
-            color: #FF6B00 !important;
-        }
-        
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 8px;
-        }
-        .stTabs [data-baseweb="tab"] {
-            height: 50px;
-            white-space: pre-wrap;
-            background-color: #F0F2F6;
-            border-radius: 4px 4px 0px 0px;
-            gap: 1px;
-            padding-top: 10px;
-            padding-bottom: 10px;
-            font-weight: 900;
-            font-size: 1.1em;
-        }
-        .stTabs [aria-selected="true"] {
-            background-color: #FFFFFF;
-            border-bottom: 3px solid #FF6B00;
-            font-weight: 900;
-            font-size: 1.2em;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        style, svg_data_url = get_title_assets()
+        st.markdown(style, unsafe_allow_html=True)
         
         # Render the custom title
         st.markdown(f"""
@@ -107,7 +152,9 @@ def render_custom_title():
         st.error(f"Error loading assets: {e}")
         st.title("➰ Loopify")
 
-
+# Each tab is a fragment, so editing a field reruns only the tab it is
+# in rather than the whole page.
+@st.fragment
 def render_single_request_tab():
     with st.expander("Import from cURL"):
         curl_command = st.text_area("Paste cURL command here", 
@@ -154,6 +201,14 @@ def render_single_request_tab():
         url = st.text_input("URL", 
                             placeholder="Enter request URL", 
                             key="request_url")
+    col_version, col_compression, col_accept = st.columns([1, 1, 1], vertical_alignment="bottom")
+    with col_version:
+        http_version = st.selectbox("HTTP version", list(HTTP_VERSIONS), format_func=HTTP_VERSIONS.get, key="request_http_version")
+    with col_compression:
+        compression = st.selectbox("Compress request body", list(REQUEST_ENCODINGS), format_func=REQUEST_ENCODINGS.get,
+                                   key="request_compression")
+    with col_accept:
+        compress_responses = st.checkbox("Accept compressed responses", value=True, key="request_accept_encoding")
     if st.button("Send Request", type="primary", width='stretch'):
         method = st.session_state.request_method
         url = st.session_state.request_url
@@ -170,9 +225,21 @@ def render_single_request_tab():
                     kwargs['data'] = st.session_state.payload_body.encode('utf-8')
                     if 'Content-Type' not in headers:
                         headers['Content-Type'] = 'text/plain'
+            if compression != "none" and 'json' in kwargs:
+                kwargs['data'] = json.dumps(kwargs.pop('json')).encode('utf-8')
+                headers.setdefault('Content-Type', 'application/json')
+            elif compression != "none" and isinstance(kwargs.get('data'), dict):
+                kwargs['data'] = urlencode(kwargs['data']).encode('utf-8')
+                headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+            kwargs['headers'], data = encode_request(headers, kwargs.get('data'), compression, compress_responses)
+            if data is not None:
+                kwargs['data'] = data
+            session = get_http_session(http_version == "2")
+            before = get_pool_stats(session)
             with st.spinner("Sending request..."):
-                response = requests.request(method, url, **kwargs)
+                response = session.request(method, url, **kwargs)
             st.session_state.response = response
+            st.session_state.response_pool_stats = diff_pool_stats(before, get_pool_stats(session))
         except json.JSONDecodeError:
             st.error("Invalid JSON. Please check your syntax.")
         except Exception as e:
@@ -235,6 +302,10 @@ def render_single_request_tab():
                 st.metric("Status Code", f"{status} Server Error ❌")
             else:
                 st.metric("Status Code", f"{status} ℹ️")
+            pool_stats = st.session_state.get("response_pool_stats")
+            if pool_stats:
+                reused = "reused a pooled connection" if pool_stats["reused"] else "opened a new connection"
+                st.caption(f"Connection: {reused} over {response_protocol(response)}")
             resp_body_tab, resp_header_tab = st.tabs(["Body", "Headers"])
             with resp_body_tab:
                 try:
@@ -246,18 +317,21 @@ def render_single_request_tab():
         else:
             st.info("Click 'Send Request' to see the response here.")
 
+@st.fragment
 def render_batch_runner_tab():
     st.header("🚀 Loopify Pro - Batch Runner")
     st.markdown("""
-    Execute multiple API requests in sequence with configurable delays between calls.
+    Execute multiple API requests, one after another or several at once, with configurable delays between calls.
     Perfect for testing workflows, load testing, or processing batch operations.
+    Batches run in the background, so you can keep using the app or start another one while they go.
+    Switch to **Load test** to replay the file as a scenario against a target for a fixed time instead.
     """)
     
     sample_data = [
-        {"method": "GET", "url": "https.httpbin.org/get?item=1", "headers": '{"Accept": "application/json"}', "payload_type": "none", "payload": ""},
-        {"method": "POST", "url": "https.httpbin.org/post", "headers": '{"Content-Type": "application/json"}', "payload_type": "json", "payload": '{"name": "Item 1", "value": 100}'},
-        {"method": "PUT", "url": "https.httpbin.org/put", "headers": "", "payload_type": "form", "payload": '{"id": "A123", "status": "updated"}'},
-        {"method": "GET", "url": "https.httpbin.org/status/404", "headers": "", "payload_type": "none", "payload": ""},
+        {"method": "GET", "url": "https://httpbin.org/get?item=1", "headers": '{"Accept": "application/json"}', "payload_type": "none", "payload": ""},
+        {"method": "POST", "url": "https://httpbin.org/post", "headers": '{"Content-Type": "application/json"}', "payload_type": "json", "payload": '{"name": "Item 1", "value": 100}'},
+        {"method": "PUT", "url": "https://httpbin.org/put", "headers": "", "payload_type": "form", "payload": '{"id": "A123", "status": "updated"}'},
+        {"method": "GET", "url": "https://httpbin.org/status/404", "headers": "", "payload_type": "none", "payload": ""},
     ]
     sample_df = pd.DataFrame(sample_data)
     
@@ -272,25 +346,530 @@ def render_batch_runner_tab():
         mime="text/csv",
     )
     st.divider()
-    uploaded_file = st.file_uploader("Upload your CSV or JSON batch file", type=["csv", "json"])
-    delay = st.number_input("Delay between requests (seconds)", min_value=0.0, max_value=60.0, value=1.0, step=0.5)
+    batch_source = st.radio("Batch source", ["Upload a file", "Request template"], horizontal=True,
+                            help="A template is one request with {{placeholders}}, filled in from a range, "
+                                 "a list or a CSV file. Requests are generated as they are sent.")
+    if batch_source == "Request template":
+        uploaded_file = render_template_builder()
+    else:
+        uploaded_file = st.file_uploader(
+            "Upload your CSV, JSON or JSON Lines batch file, a .template.json or a .workflow.json",
+            type=["csv", "json", "jsonl", "ndjson"],
+            help="A workflow chains requests: each step can extract values (JSONPath or header:Name) for later steps, "
+                 "and independent steps and workflow instances run in parallel.",
+        )
+    mode = st.radio("Mode", ["Replay file", "Load test"], horizontal=True,
+                    help="Replay sends every row once. Load test keeps picking rows from the file until the time is up.")
+    if mode == "Load test":
+        render_load_test_options(uploaded_file)
+    else:
+        render_replay_options(uploaded_file)
+    if st.session_state.get("batch_jobs"):
+        render_batch_jobs()
+    if "batch_output" in st.session_state:
+        render_batch_results(st.session_state.batch_output)
+
+def parse_template_json(text):
+    # Placeholders inside JSON strings keep the text valid JSON, and the
+    # object form lets values be escaped properly; anything else is used as
+    # plain text with the values pasted in.
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+def render_template_builder():
+    st.caption("Write `{{name}}` wherever a value should go, in the URL, headers or payload.")
+    col_method, col_url = st.columns([1, 4])
+    with col_method:
+        method = st.selectbox("Method", ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"], key="template_method")
+    with col_url:
+        url = st.text_input("URL", value="https://httpbin.org/anything/{{id}}", key="template_url")
+    col_headers, col_payload = st.columns(2)
+    with col_headers:
+        headers = st.text_area("Headers (JSON)", value='{"Accept": "application/json"}', key="template_headers")
+    with col_payload:
+        payload_type = st.selectbox("Payload type", ["none", "json", "form", "text"], key="template_payload_type")
+        payload = st.text_area("Payload", value='{"id": "{{id}}"}', key="template_payload", disabled=(payload_type == "none"))
+    data_source = st.radio("Fill placeholders from", list(DATA_SOURCES), format_func=DATA_SOURCES.get, horizontal=True)
+    if data_source == "csv":
+        data_file = st.file_uploader("CSV with one column per placeholder", type=["csv"], key="template_data")
+        if data_file is None:
+            return None
+        data = {"csv": save_template_data(data_file)}
+    else:
+        name = st.text_input("Placeholder name", value="id", key="template_name")
+        if data_source == "range":
+            col_start, col_end, col_step = st.columns(3)
+            with col_start:
+                start = st.number_input("From", value=1, step=1, key="template_start")
+            with col_end:
+                end = st.number_input("To (inclusive)", value=100, step=1, key="template_end")
+            with col_step:
+                step = st.number_input("Step", value=1, step=1, key="template_step")
+            data = {"name": name, "range": {"start": int(start), "end": int(end), "step": int(step)}}
+        else:
+            values = st.text_area("Values, one per line", key="template_values")
+            data = {"name": name, "values": [line.strip() for line in values.splitlines() if line.strip()]}
+    spec = {
+        "request": {
+            "method": method, "url": url.strip(), "headers": parse_template_json(headers) if headers.strip() else "",
+            "payload_type": payload_type, "payload": parse_template_json(payload) if payload_type != "none" else "",
+        },
+        "data": data,
+    }
+    try:
+        check_template(spec)
+        preview = next(iter_template_chunks(spec, 3), None)
+    except ValueError as e:
+        st.error(str(e))
+        return None
+    if preview is None:
+        st.warning("The data source is empty, so there are no requests to send.")
+        return None
+    size = template_size(spec)
+    st.caption(f"First requests{f' of {size:,}' if size is not None else ''}:")
+    st.dataframe(preview, hide_index=True, width='stretch')
+    upload = io.BytesIO(json.dumps(spec).encode('utf-8'))
+    upload.name = "request.template.json"
+    upload.file_id = fingerprint_source(upload)
+    return upload
+
+def render_load_test_options(uploaded_file):
+    st.caption("Rows are picked at random on every request. Add an optional `weight` column to send some rows more often than others.")
+    model = st.radio("Load model", ["Virtual users", "Arrival rate"], horizontal=True,
+                     help="Virtual users each wait for their response before sending the next request. "
+                          "Arrival rate starts requests on a fixed schedule however slow the target gets.")
+    col_load, col_ramp, col_duration, col_think = st.columns(4)
+    with col_load:
+        if model == "Virtual users":
+            users = st.number_input("Virtual users", min_value=1, max_value=MAX_IN_FLIGHT, value=10, step=1)
+            arrival_rate = None
+        else:
+            arrival_rate = st.number_input("Requests per second", min_value=0.1, max_value=10000.0, value=10.0, step=1.0)
+            users = 1
+    with col_ramp:
+        ramp_up = st.number_input("Ramp-up (seconds)", min_value=0.0, max_value=3600.0, value=0.0, step=5.0,
+                                  help="Users join (or the rate climbs) evenly over this time.")
+    with col_duration:
+        duration = st.number_input("Duration (seconds)", min_value=1.0, max_value=86400.0, value=60.0, step=10.0)
+    with col_think:
+        think_time = st.number_input("Think time (seconds)", min_value=0.0, max_value=600.0, value=0.0, step=0.5,
+                                     disabled=(model != "Virtual users"),
+                                     help="Pause between one response and the same user's next request.")
+    col_connect, col_read = st.columns(2)
+    with col_connect:
+        connect_timeout = st.number_input("Connect timeout (seconds)", min_value=0.1, max_value=300.0, value=DEFAULT_CONNECT_TIMEOUT, step=1.0, key="load_connect_timeout")
+    with col_read:
+        read_timeout = st.number_input("Read timeout (seconds)", min_value=0.1, max_value=600.0, value=DEFAULT_READ_TIMEOUT, step=1.0, key="load_read_timeout")
+    metrics_format = render_metrics_option("load")
+    if st.button("Start Load Test", type="primary", width='stretch', disabled=(not uploaded_file)):
+        file_type = detect_file_type(uploaded_file.name)
+        if file_type == "workflow":
+            st.error("Load tests replay the rows of a batch file; run workflows with Replay file.")
+            st.stop()
+        run_dir = new_run_dir()
+        # Every user (or every in-flight arrival) needs its own keep-alive
+        # connection; pools come in powers of two so only a few are cached.
+        workers = users if model == "Virtual users" else MAX_IN_FLIGHT
+        per_host = max(DEFAULT_PER_HOST, 1 << (int(workers) - 1).bit_length())
+        job = get_job_manager().start(
+            f"{uploaded_file.name} (load test)", run_dir, target=run_load_test,
+            source=save_upload(uploaded_file, run_dir, file_type), file_type=file_type,
+            users=users, arrival_rate=arrival_rate, ramp_up=ramp_up, duration=duration,
+            think_time=think_time if model == "Virtual users" else 0, session=get_http_session(per_host=per_host),
+            connect_timeout=connect_timeout, read_timeout=read_timeout,
+            hooks=metrics_hooks(metrics_format, run_dir, f"{uploaded_file.name} (load test)"),
+        )
+        st.session_state.setdefault("batch_jobs", []).append(job.job_id)
+
+def render_metrics_option(key, disabled=False):
+    with st.expander("Live metrics"):
+        enabled = st.checkbox(
+            "Write live metrics while the run goes", key=f"{key}_metrics", disabled=disabled,
+            help="Counters and a latency histogram are rewritten to a file in the run folder about once a second, "
+                 "for Prometheus (node exporter textfile collector) or any dashboard. Needs a single worker process.",
+        )
+        metrics_format = st.selectbox("Metrics format", list(METRICS_FORMATS), format_func=METRICS_FORMATS.get,
+                                      key=f"{key}_metrics_format", disabled=disabled or not enabled)
+    return metrics_format if enabled and not disabled else None
+
+def metrics_hooks(metrics_format, run_dir, name):
+    if metrics_format is None:
+        return None
+    path = os.path.join(run_dir, "metrics.json" if metrics_format == "json" else "metrics.prom")
+    st.caption(f"Live metrics: `{path}`")
+    return [MetricsExporter(path, metrics_format, labels={"batch": name})]
+
+def render_replay_options(uploaded_file):
+    col_rate, col_concurrency = st.columns(2)
+    with col_rate:
+        throttle = st.radio("Throttle by", ["Requests per second", "Delay between requests"], horizontal=True)
+        if throttle == "Requests per second":
+            rps = st.number_input("Target requests per second (0 = unlimited)", min_value=0.0, max_value=10000.0, value=1.0, step=1.0)
+            delay = 0.0
+        else:
+            delay = st.number_input("Delay between requests (seconds)", min_value=0.0, max_value=60.0, value=1.0, step=0.5)
+            rps = 0.0
+    with col_concurrency:
+        concurrency = st.number_input("Concurrent requests", min_value=1, max_value=64, value=1, step=1,
+                                      help="How many requests may be in flight at once. Results keep the file's row order.")
+        processes = st.number_input("Worker processes", min_value=1, max_value=MAX_PROCESSES, value=1, step=1,
+                                    help="Split big batches across several processes to use more CPU cores. "
+                                         "Concurrency and rate limits are shared out between them. "
+                                         "Runs with more than one process can't be resumed.")
+    with st.expander("Rate limiting options"):
+        col_burst, col_host = st.columns(2)
+        with col_burst:
+            burst = st.number_input("Burst size", min_value=1, max_value=10000, value=1, step=1,
+                                    help="How many requests may start back to back before the target rate applies.")
+        with col_host:
+            per_host_rps = st.number_input("Per-host requests per second (0 = no per-host limit)", min_value=0.0, max_value=10000.0, value=0.0, step=1.0)
+        adaptive = st.checkbox("Back off on 429/503 and Retry-After, then ramp back up", value=True)
+    with st.expander("Retries & timeouts"):
+        col_attempts, col_base, col_max = st.columns(3)
+        with col_attempts:
+            max_attempts = st.number_input("Max attempts per row", min_value=1, max_value=20, value=1, step=1,
+                                           help="1 means no retries.")
+        with col_base:
+            backoff_base = st.number_input("First backoff (seconds)", min_value=0.0, max_value=60.0, value=0.5, step=0.1,
+                                           help="Doubles on every attempt, with random jitter.")
+        with col_max:
+            backoff_max = st.number_input("Longest backoff (seconds)", min_value=0.0, max_value=600.0, value=30.0, step=1.0)
+        retry_statuses = st.text_input("Retry on status codes", value=", ".join(str(code) for code in DEFAULT_RETRY_STATUSES))
+        retry_errors = st.multiselect(
+            "Retry on errors", list(RETRY_ERROR_TYPES), default=list(DEFAULT_RETRY_ERRORS),
+            format_func=RETRY_ERROR_TYPES.get,
+        )
+        retry_non_idempotent = st.checkbox(
+            "Also retry POST and PATCH after a timeout or server error",
+            help="Off by default because the first attempt may already have been processed. "
+                 "Connection failures and 429/503 responses are always safe to retry.",
+        )
+        col_connect, col_read = st.columns(2)
+        with col_connect:
+            connect_timeout = st.number_input("Connect timeout (seconds)", min_value=0.1, max_value=300.0, value=DEFAULT_CONNECT_TIMEOUT, step=1.0)
+        with col_read:
+            read_timeout = st.number_input("Read timeout (seconds)", min_value=0.1, max_value=600.0, value=DEFAULT_READ_TIMEOUT, step=1.0)
+    with st.expander("Transport & compression"):
+        col_version, col_compression = st.columns(2)
+        with col_version:
+            http_version = st.selectbox(
+                "HTTP version", list(HTTP_VERSIONS), format_func=HTTP_VERSIONS.get, key="batch_http_version",
+                help="HTTP/2 sends concurrent rows to a host as streams over one connection instead of one connection each. "
+                     "Hosts without HTTP/2 fall back to HTTP/1.1.",
+            )
+        with col_compression:
+            compression = st.selectbox(
+                "Compress request bodies", list(REQUEST_ENCODINGS), format_func=REQUEST_ENCODINGS.get, key="batch_compression",
+                help="Sets Content-Encoding on bodies of 256 bytes or more. Only use it if the server accepts compressed requests.",
+            )
+        compress_responses = st.checkbox("Accept compressed responses (gzip, deflate, and br when installed)", value=True,
+                                         key="batch_accept_encoding")
+    with st.expander("Response cache"):
+        use_cache = st.checkbox(
+            "Reuse responses for identical GET and HEAD rows",
+            help="Rows with the same method, URL, headers and body are sent once; duplicates get the stored "
+                 "response, and duplicates in flight wait for the first one. Marked in the Cache column.",
+        )
+        col_ttl, col_disk = st.columns(2)
+        with col_ttl:
+            cache_ttl = st.number_input("Keep responses for (seconds)", min_value=0.0, max_value=7 * 24 * 3600.0,
+                                        value=DEFAULT_TTL, step=60.0, disabled=not use_cache,
+                                        help="After this the server is asked again, with If-None-Match/If-Modified-Since "
+                                             "when it sent an ETag or Last-Modified. Shorter Cache-Control max-age wins.")
+        with col_disk:
+            keep_cache = st.checkbox("Keep the cache between runs", disabled=not use_cache,
+                                     help=f"Stores responses in `{CACHE_PATH}`.")
+            if os.path.exists(CACHE_PATH) and st.button("Clear saved cache"):
+                store = DiskStore(CACHE_PATH)
+                store.clear()
+                store.close()
+                st.toast("Saved responses cleared.")
+    metrics_format = render_metrics_option("batch", disabled=processes > 1)
+    send_invalid = st.checkbox(
+        "Send rows with problems anyway",
+        help="The file is checked before anything is sent. By default any problem stops the batch; "
+             "with this on, bad headers are dropped and bad JSON payloads are sent as text.",
+    )
+    col_capture, col_bytes = st.columns(2)
+    with col_capture:
+        capture_mode = st.selectbox(
+            "Response bodies", list(CAPTURE_MODES), format_func=CAPTURE_MODES.get,
+            help="Bodies are streamed and only what you pick here is kept. Full bodies are capped at 10 MB; "
+                 "the hash lets you compare responses without storing them.",
+        )
+    with col_bytes:
+        truncate_bytes = st.number_input("Bytes to keep", min_value=1, max_value=10 * 1024 * 1024, value=DEFAULT_TRUNCATE_BYTES,
+                                         step=256, disabled=(capture_mode != "truncate"))
+    output_format = st.selectbox(
+        "Save results as", ["csv", "jsonl", "parquet"],
+        format_func=lambda fmt: {"csv": "CSV", "jsonl": "JSON Lines", "parquet": "Parquet"}[fmt],
+        help="Results are appended to this file as each request finishes instead of being kept in memory. "
+             "CSV and JSON Lines runs are checkpointed and can be resumed if interrupted.",
+    )
+    job_manager = get_job_manager()
+    resume = False
+    if uploaded_file and output_format != "parquet" and processes == 1 and detect_file_type(uploaded_file.name) != "workflow":
+        run_dir = new_run_dir(get_upload_id(uploaded_file, output_format))
+        checkpoint = load_checkpoint(checkpoint_path(run_dir))
+        if job_manager.is_running(run_dir):
+            st.info("This file is already running in the background with these settings.")
+        elif checkpoint and not checkpoint["complete"]:
+            done = checkpoint["flushed"] + len(checkpoint["ready"])
+            resume = st.checkbox(
+                f"Resume the interrupted run of this file ({done} rows already done)", value=True,
+                help="Rows with a saved result are not sent again. Untick to start over from row 1.",
+            )
     if st.button("Run Batch", type="primary", width='stretch', disabled=(not uploaded_file)):
-        file_content = uploaded_file.getvalue().decode("utf-8")
-        file_type = uploaded_file.type.split('/')[1]
-        with st.spinner("Batch in progress..."):
-            results_df = run_batch_requests(file_content, file_type, delay)
-        if results_df is not None:
-            st.session_state.batch_results = results_df
-    if "batch_results" in st.session_state:
-        st.subheader("Batch Results")
-        st.dataframe(st.session_state.batch_results, width='stretch')
-        st.download_button(
-            label="Download Results as CSV",
-            data=convert_df_to_csv(st.session_state.batch_results),
-            file_name="batch_results.csv",
-            mime="text/csv",
-            type="primary"
+        file_type = detect_file_type(uploaded_file.name)
+        try:
+            retry_policy = RetryPolicy(
+                max_attempts, backoff_base, backoff_max,
+                retry_statuses=parse_status_list(retry_statuses), retry_errors=retry_errors,
+                retry_non_idempotent=retry_non_idempotent,
+            )
+        except ValueError as e:
+            st.error(f"Retry status codes: {e}")
+            st.stop()
+        workflow = file_type == "workflow"
+        options = {}
+        if workflow:
+            run_dir = new_run_dir()
+            options = {"target": run_workflows}
+        elif processes > 1:
+            run_dir = new_run_dir()
+            options = {"target": run_sharded_batch, "processes": processes}
+        elif output_format != "parquet":
+            source_id = get_upload_id(uploaded_file, output_format)
+            run_dir = new_run_dir(source_id)
+            options = {
+                "checkpoint_path": checkpoint_path(run_dir),
+                "resume": resume, "source_id": source_id,
+            }
+        else:
+            run_dir = new_run_dir()
+        if not workflow:
+            # Workflow steps share extracted values, so they are never cached
+            # and their rows are checked when each step is rendered.
+            options.update(
+                file_type=file_type, send_invalid=send_invalid,
+                cache=ResponseCache(ttl=cache_ttl, store_path=CACHE_PATH if keep_cache else None) if use_cache else None,
+            )
+        try:
+            job = job_manager.start(
+                uploaded_file.name, run_dir, source=save_upload(uploaded_file, run_dir, file_type),
+                delay=delay, concurrency=concurrency, session=get_http_session(http_version == "2") if processes == 1 or workflow else None,
+                http2=http_version == "2", compression=compression, compress_responses=compress_responses,
+                rps=rps, burst=burst, per_host_rps=per_host_rps, adaptive=adaptive,
+                output_path=results_path(run_dir, output_format), output_format=output_format,
+                retry_policy=retry_policy, connect_timeout=connect_timeout, read_timeout=read_timeout,
+                capture=BodyCapture(capture_mode, truncate_bytes if capture_mode == "truncate" else None),
+                hooks=metrics_hooks(metrics_format, run_dir, uploaded_file.name),
+                **options,
+            )
+            st.session_state.setdefault("batch_jobs", []).append(job.job_id)
+        except (ValueError, ImportError) as e:
+            st.error(str(e))
+
+def show_batch_results(job):
+    st.session_state.batch_output = job["summary"]
+    st.session_state.batch_pool_stats = job["pool_stats"]
+    st.session_state.batch_page = max(1, -(-job["summary"]["rows"] // RESULTS_PAGE_SIZE))
+    st.session_state.batch_shown_job = job["job_id"]
+
+def render_batch_jobs():
+    job_manager = get_job_manager()
+    jobs = [job_manager.get(job_id) for job_id in st.session_state.batch_jobs]
+    jobs = [job for job in jobs if job is not None]
+    st.session_state.batch_jobs = [job.job_id for job in jobs]
+    any_active = any(job.active for job in jobs)
+
+    # Only this block reruns while batches are going, at a fixed interval,
+    # so progress costs one small redraw per second rather than one per row.
+    @st.fragment(run_every=JOB_POLL_INTERVAL if any_active else None)
+    def batch_jobs_panel():
+        st.subheader("Batch Jobs")
+        finished_now = False
+        for job in jobs:
+            snap = job.snapshot()
+            icon = {"queued": "⏳", "running": "🔄", "done": "✅", "cancelled": "⏹️", "failed": "❌"}[snap["status"]]
+            col_info, col_action = st.columns([4, 1])
+            with col_info:
+                st.progress(min(1.0, snap["fraction"]), text=f"{icon} {snap['name']} · {snap['progress_text']}")
+            with col_action:
+                if job.active:
+                    if st.button("Cancel", key=f"cancel_{snap['job_id']}", width='stretch'):
+                        job_manager.cancel(snap["job_id"])
+                else:
+                    if snap["summary"] is not None and st.button("View results", key=f"view_{snap['job_id']}", width='stretch'):
+                        show_batch_results(snap)
+                        st.rerun()
+                    if st.button("Dismiss", key=f"dismiss_{snap['job_id']}", width='stretch'):
+                        job_manager.remove(snap["job_id"])
+                        st.session_state.batch_jobs.remove(snap["job_id"])
+                        st.rerun()
+            if job.active and snap["live"] and snap["live"]["history"]:
+                history = pd.DataFrame(snap["live"]["history"]).set_index("second")
+                col_rate, col_latency = st.columns(2)
+                with col_rate:
+                    st.line_chart(history[["requests_per_s", "errors_per_s"]], height=160)
+                with col_latency:
+                    st.line_chart(history[["p50_ms", "p95_ms"]], height=160)
+            if snap["messages"]:
+                with st.expander(f"Messages ({len(snap['messages']) + snap['dropped_messages']})"):
+                    for level, text in snap["messages"]:
+                        getattr(st, level)(text)
+                    if snap["dropped_messages"]:
+                        st.caption(f"{snap['dropped_messages']} more messages not shown.")
+            if not job.active and snap["job_id"] not in st.session_state.get("batch_seen_jobs", set()):
+                st.session_state.setdefault("batch_seen_jobs", set()).add(snap["job_id"])
+                if snap["summary"] is not None:
+                    show_batch_results(snap)
+                finished_now = True
+        if finished_now:
+            st.rerun()
+
+    batch_jobs_panel()
+
+def render_batch_results(summary):
+    st.subheader("Batch Results")
+    pool_stats = st.session_state.get("batch_pool_stats")
+    if pool_stats:
+        st.caption(
+            f"Connection pool: {pool_stats['requests']} requests over {pool_stats['connections']} new connections "
+            f"({pool_stats['reused']} reused keep-alive connections, no new handshake)."
+        )
+    if summary.get("report"):
+        render_batch_report(summary["report"])
+    load_test = summary.get("load_test")
+    if load_test:
+        load = (f"{load_test['users']} virtual users" if load_test["model"] == "closed"
+                else f"{load_test['arrival_rate']:g} requests per second")
+        st.caption(
+            f"Load test: {load} for {load_test['duration']:g} s with {load_test['ramp_up']:g} s ramp-up, "
+            f"picking from {load_test['scenario_requests']} requests. {summary['rows']} requests sent, "
+            f"{load_test['dropped']} arrivals dropped. Individual responses are not kept in load tests."
         )
+    workflows = summary.get("workflows")
+    if workflows:
+        st.caption(
+            f"Workflows: {workflows['instances']:,} run with {workflows['steps']} steps each - "
+            f"{workflows['completed']:,} completed, {workflows['failed']:,} failed, {workflows['cancelled']:,} cancelled. "
+            "Steps after a failed one are marked SKIPPED."
+        )
+    if summary.get("shards"):
+        with st.expander(f"Per-process breakdown ({len(summary['shards'])} processes)"):
+            shards = pd.DataFrame(summary["shards"]).rename(columns={
+                "shard": "Process", "status": "Status", "rows": "Rows", "errors": "Errors",
+                "throughput_rps": "Requests/s", "p50_ms": "p50 (ms)", "p90_ms": "p90 (ms)",
+                "connections": "Connections",
+            })
+            st.dataframe(shards, hide_index=True, width='stretch')
+    if summary["output_path"] is None:
+        return
+    if not os.path.exists(summary["output_path"]):
+        st.caption(f"The results file `{summary['output_path']}` is gone.")
+        return
+    stat = os.stat(summary["output_path"])
+    store = get_results_store(summary["output_path"], summary["output_format"], stat.st_size, stat.st_mtime)
+    status_counts = store.status_counts()
+    col_status, col_url, col_error = st.columns(3)
+    with col_status:
+        statuses = st.multiselect("Status", list(status_counts), key="batch_filter_status",
+                                  format_func=lambda klass: f"{klass} ({status_counts.get(klass, 0):,})")
+    with col_url:
+        url_filter = st.text_input("URL contains", key="batch_filter_url")
+    with col_error:
+        error_filter = st.text_input("Error contains", key="batch_filter_error")
+    positions = store.filter(statuses, url_filter.strip(), error_filter.strip())
+    rows = len(store) if positions is None else len(positions)
+    pages = max(1, -(-rows // RESULTS_PAGE_SIZE))
+    # Filters can shrink the page count below the page being shown.
+    if st.session_state.get("batch_page", 1) > pages:
+        st.session_state.batch_page = pages
+    col_info, col_page = st.columns([3, 1])
+    with col_page:
+        page = st.number_input("Page", min_value=1, max_value=pages, key="batch_page")
+    with col_info:
+        matching = f"{rows:,} of {len(store):,} results match. " if positions is not None else ""
+        st.caption(
+            f"{matching}{summary['rows']} results ({summary['errors']} errors) saved to `{summary['output_path']}`. "
+            f"Showing page {page} of {pages}; the last page is shown after a run."
+        )
+    page_table, page_rows = store.page(positions, (page - 1) * RESULTS_PAGE_SIZE, RESULTS_PAGE_SIZE)
+    if not store.workflows:
+        page_table = page_table.drop_columns(["Workflow #", "Step"])
+    # Only this page goes to the browser; bodies stay out of the table.
+    st.dataframe(page_table, width='stretch', hide_index=True)
+    if page_table.num_rows:
+        with st.expander("Inspect a response"):
+            numbers = page_table["Request #"].to_pylist()
+            choice = st.selectbox("Row", range(len(numbers)), format_func=lambda i: f"Request #{numbers[i]}", key="batch_inspect_row")
+            parsed = parse_body(store.body(page_rows[choice]))
+            if isinstance(parsed, (dict, list)):
+                st.json(parsed)
+            else:
+                st.code(str(parsed), language="text")
+    with st.expander("Group results"):
+        group_by = st.selectbox("Group by", [column for column in GROUP_BY if column != "Step" or store.workflows], key="batch_group_by")
+        st.dataframe(store.aggregate(group_by, positions), hide_index=True, width='stretch')
+    if st.button("Prepare results for download"):
+        with open(summary["output_path"], "rb") as f:
+            st.download_button(
+                label="Download Results",
+                data=f.read(),
+                file_name=os.path.basename(summary["output_path"]).replace("results", "batch_results"),
+                type="primary"
+            )
+
+def format_ms(value):
+    return f"{value:,.0f} ms" if value >= 10 else f"{value:.1f} ms"
+
+def render_batch_report(report):
+    if not report["rows"]:
+        return
+    with st.expander("Performance report", expanded=True):
+        latency = report["latency_ms"]
+        cols = st.columns(7)
+        cols[0].metric("Requests", f"{report['rows']:,}")
+        cols[1].metric("Throughput", f"{report['throughput_rps']:.1f}/s" if report["throughput_rps"] else "n/a")
+        cols[2].metric("Error rate", f"{report['error_rate']:.1%}", help="Requests that failed outright or got a 5xx.")
+        hits = (f"{report['cache_hits']:,} responses served from the cache are left out of the latency figures."
+                if report.get("cache_hits") else None)
+        for col, key in zip(cols[3:], ("p50", "p90", "p99", "max")):
+            col.metric(f"Latency {key}", format_ms(latency[key]) if latency else "n/a", help=hits)
+        if hits:
+            st.caption(hits)
+        if report["ttfb_ms"]:
+            ttfb = report["ttfb_ms"]
+            st.caption(
+                f"Time to first byte: p50 {format_ms(ttfb['p50'])}, p90 {format_ms(ttfb['p90'])}, p99 {format_ms(ttfb['p99'])}. "
+                f"Sent {report['request_bytes']:,} bytes of request bodies, received {report['response_bytes']:,} bytes of response bodies "
+                f"in {report['duration_s']:.1f} s."
+            )
+        if report.get("cache"):
+            st.caption("Response cache: " + ", ".join(
+                f"{count:,} {CACHE_OUTCOMES.get(outcome, outcome).lower()}" for outcome, count in report["cache"].items()
+            ) + ".")
+        col_status, col_errors = st.columns(2)
+        with col_status:
+            st.markdown("###### Responses by status")
+            st.bar_chart(pd.Series(report["status_classes"], name="requests"))
+        with col_errors:
+            st.markdown("###### Failures by type")
+            if report["error_types"]:
+                st.dataframe(pd.DataFrame(list(report["error_types"].items()), columns=["Error", "Requests"]), hide_index=True, width='stretch')
+            else:
+                st.caption("No requests failed outright.")
+        st.markdown("###### Latency histogram")
+        st.bar_chart(pd.DataFrame(report["histogram"]).set_index("bucket"), y="requests")
+        if report["timeline"]:
+            timeline = pd.DataFrame(report["timeline"]).set_index("second")
+            st.markdown("###### Latency over time (seconds since start)")
+            st.line_chart(timeline[["p50_ms", "p90_ms", "max_ms"]])
+            st.markdown("###### Throughput over time")
+            st.area_chart(timeline[["requests_per_s", "errors_per_s"]])
 
 def render_footer():
     st.markdown(
@@ -306,34 +885,7 @@ def render_ui():
     initialize_session_state()
     render_custom_title()
     
-    tab_style = """
-    <style>
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #F0F2F6;
-        border-radius: 4px 4px 0px 0px;
-        gap: 1px;
-        padding-top: 10px;
-        padding-bottom: 10px;
-        font-weight: 900;
-        font-size: 1.1em;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #FFFFFF;
-        border-bottom: 3px solid #FF6B00;
-        font-weight: 900;
-        font-size: 1.2em;
-    }
-    </style>
-    """
-    
-    st.markdown(tab_style, unsafe_allow_html=True)
-    
-    tab1, tab2 = st.tabs(["🔧 Single Request", "🚀 LOOPIFY PRO"])
+    tab1, tab2 = st.tabs(TAB_LABELS)
     
     with tab1:
         render_single_request_tab()